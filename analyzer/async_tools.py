@@ -0,0 +1,56 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from . import tools
+
+# --- Vector DB 도구의 비동기 버전 ---
+# ADK는 동기 도구를 이벤트 루프 안에서 그대로 호출하므로 임베딩 요청이나 재시도 대기 동안
+# 다른 이미지의 분석까지 멈춤. 같은 이름/시그니처/docstring을 유지한 채 전용 스레드 풀에서
+# 동기 구현을 실행하고, ADK는 이를 await 함. 단계별 추적(tracing)이 도구 안에서도 이어지도록
+# 호출한 태스크의 컨텍스트를 복사해서 실행함.
+
+# 동시에 처리할 도구 호출 수. 각 스레드의 임베딩 요청은 EmbeddingService에서 하나의 배치로 묶임
+TOOL_WORKERS = 8
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """도구 전용 스레드 풀을 반환합니다 (싱글턴)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="vectordb-tool")
+    return _executor
+
+
+@functools.wraps(tools.search_local_db)
+async def search_local_db(
+    key_features: list[str],
+    country: str = "",
+    lang: str = "",
+    category: str = "",
+    top_k: int = tools.DEFAULT_TOP_K,
+) -> str:
+    loop = asyncio.get_running_loop()
+    call = functools.partial(tools.search_local_db, key_features, country, lang, category, top_k)
+    return await loop.run_in_executor(_get_executor(), contextvars.copy_context().run, call)
+
+
+@functools.wraps(tools.save_to_local_db)
+async def save_to_local_db(
+    product_name: str,
+    brand: str,
+    category: str,
+    key_features: list[str],
+    source: str,
+    country: str = "KR",
+    lang: str = "ko",
+) -> str:
+    loop = asyncio.get_running_loop()
+    call = functools.partial(
+        tools.save_to_local_db,
+        product_name, brand, category, key_features, source, country, lang,
+    )
+    return await loop.run_in_executor(_get_executor(), contextvars.copy_context().run, call)
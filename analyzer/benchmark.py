@@ -0,0 +1,382 @@
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from usearch.index import Index
+
+from . import tools
+from .embedding import EMBEDDING_DIM, EmbeddingService, set_embedding_service
+from .quantize import QUERY_NOISE, exact_top_k, normalize_rows, recall_at_k
+
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_QUERIES = 200
+DEFAULT_K = 3
+DEFAULT_SAVES = 200
+# HNSW 파라미터 스윕 범위 (usearch 기본값: connectivity 16, expansion_add 128, expansion_search 64)
+DEFAULT_CONNECTIVITY = (8, 16, 32)
+DEFAULT_EXPANSION_ADD = (128,)
+DEFAULT_EXPANSION_SEARCH = (32, 64, 128)
+
+# 합성 벡터는 CLUSTERS개의 중심 주변에 분포시켜 실제 상품 임베딩처럼 군집을 이루게 함
+CLUSTERS = 1000
+CLUSTER_NOISE = 0.04
+BULK_CHUNK = 50_000
+SEED = 0
+
+MARKETS = (("KR", "ko"), ("US", "en"), ("JP", "ja"))
+CATEGORIES = ("Food", "Beverage", "Snack", "Cosmetics", "Household", "Health")
+
+
+# 합성 상품 벡터를 만들 때 재사용할 토큰 벡터 수 (브랜드/카테고리/라인 토큰은 앞쪽 항목에서 모두 등장)
+TOKEN_CACHE_SIZE = 4096
+
+
+def _hash_embedding(text: str, token_cache: dict[str, np.ndarray] | None = None) -> np.ndarray:
+    vec = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for token in text.casefold().split():
+        token_vec = token_cache.get(token) if token_cache is not None else None
+        if token_vec is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            token_vec = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM, dtype=np.float32)
+            if token_cache is not None and len(token_cache) < TOKEN_CACHE_SIZE:
+                token_cache[token] = token_vec
+        vec += token_vec
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class HashEmbeddingService(EmbeddingService):
+    """API 대신 토큰 해시로 결정적인 벡터를 만드는 로컬 임베딩 (벤치마크용).
+
+    같은 텍스트는 항상 같은 벡터가 되고, 토큰이 많이 겹칠수록 코사인 유사도가 높아집니다.
+    """
+
+    def __init__(self):
+        super().__init__(max_wait_ms=0, model="local-hash")
+
+    def _request(self, texts: list[str]) -> list[list[float]]:
+        return [_hash_embedding(text).tolist() for text in texts]
+
+
+def synthetic_vectors(n: int, seed: int = SEED, chunk: int = 100_000) -> np.ndarray:
+    """군집 구조를 가진 정규화된 float32 합성 벡터 n개를 만듭니다 (seed가 같으면 항상 같은 값)."""
+    rng = np.random.default_rng(seed)
+    centroids = normalize_rows(rng.standard_normal((CLUSTERS, EMBEDDING_DIM), dtype=np.float32))
+    vectors = np.empty((n, EMBEDDING_DIM), dtype=np.float32)
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        labels = rng.integers(0, CLUSTERS, m)
+        noise = CLUSTER_NOISE * rng.standard_normal((m, EMBEDDING_DIM), dtype=np.float32)
+        vectors[start:start + m] = normalize_rows(centroids[labels] + noise)
+    return vectors
+
+
+def synthetic_entry(i: int) -> dict:
+    """i번째 합성 상품 메타데이터. 국가/언어와 카테고리는 고르게 섞입니다."""
+    country, lang = MARKETS[i % len(MARKETS)]
+    category = CATEGORIES[i % len(CATEGORIES)]
+    return {
+        "id": f"bench-{i}",
+        "product_name": f"상품 {i}",
+        "brand": f"브랜드 {i % 500}",
+        "category": category,
+        "key_features": [f"item-{i}", f"brand-{i % 500}", category.casefold(), f"line-{i % 37}"],
+        "source": "benchmark",
+        "country": country,
+        "lang": lang,
+        "created_at": "",
+    }
+
+
+def synthetic_entry_vectors(entries: list[dict], token_cache: dict[str, np.ndarray]) -> np.ndarray:
+    """항목의 key_features를 search_local_db와 같은 방식(공백으로 이은 텍스트 → HashEmbeddingService)으로 임베딩합니다."""
+    return np.stack([_hash_embedding(" ".join(entry["key_features"]), token_cache) for entry in entries])
+
+
+def _queries(vectors: np.ndarray, n_queries: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + QUERY_NOISE * rng.standard_normal((len(picks), EMBEDDING_DIM), dtype=np.float32)
+    return normalize_rows(queries).astype(np.float32)
+
+
+def _percentiles(latencies: list[float]) -> dict:
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def _peak_rss_bytes() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위
+    return int(peak if platform.system() == "Darwin" else peak * 1024)
+
+
+def sweep_index(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = DEFAULT_K,
+    connectivity: tuple[int, ...] = DEFAULT_CONNECTIVITY,
+    expansion_add: tuple[int, ...] = DEFAULT_EXPANSION_ADD,
+    expansion_search: tuple[int, ...] = DEFAULT_EXPANSION_SEARCH,
+) -> list[dict]:
+    """HNSW 파라미터 조합별로 삽입 처리량, 검색 지연, recall@k, 메모리, 로드 시간을 측정합니다.
+
+    connectivity/expansion_add 조합마다 인덱스를 한 번 만들고, expansion_search는 같은 그래프에서 바꿔가며 잽니다.
+    기준값은 numpy 전수 비교입니다.
+    """
+    keys = np.arange(len(vectors), dtype=np.uint64)
+    expected = exact_top_k(queries, vectors, keys, k)
+    rows = []
+    for conn in connectivity:
+        for exp_add in expansion_add:
+            index = Index(ndim=EMBEDDING_DIM, metric="cos", dtype="f32", connectivity=conn, expansion_add=exp_add)
+            started = time.perf_counter()
+            index.add(keys, vectors, threads=0)
+            build_s = time.perf_counter() - started
+
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / "index.usearch"
+                index.save(str(path))
+                disk_bytes = path.stat().st_size
+                started = time.perf_counter()
+                Index.restore(str(path))
+                restore_s = time.perf_counter() - started
+                started = time.perf_counter()
+                Index.restore(str(path), view=True)
+                view_s = time.perf_counter() - started
+
+            for exp_search in expansion_search:
+                index.expansion_search = exp_search
+                latencies = []
+                found = np.full((len(queries), k), np.iinfo(np.uint64).max, dtype=np.uint64)
+                for i, query in enumerate(queries):
+                    started = time.perf_counter()
+                    result = index.search(query, k)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    found[i, :len(result.keys)] = result.keys
+
+                rows.append({
+                    "vectors": int(len(vectors)),
+                    "connectivity": conn,
+                    "expansion_add": exp_add,
+                    "expansion_search": exp_search,
+                    "insert_per_s": round(len(vectors) / build_s, 1),
+                    "build_s": round(build_s, 3),
+                    f"recall@{k}": recall_at_k(found, expected, k),
+                    "search": _percentiles(latencies),
+                    "memory_bytes": int(index.memory_usage),
+                    "disk_bytes": int(disk_bytes),
+                    "restore_s": round(restore_s, 4),
+                    "view_s": round(view_s, 4),
+                })
+    return rows
+
+
+def bench_tools(n: int, n_queries: int = DEFAULT_QUERIES, n_saves: int = DEFAULT_SAVES) -> dict:
+    """임시 디렉토리의 Vector DB로 도구 함수 경로(적재, 스냅샷, 로드, 검색, 저장)를 측정합니다.
+
+    임베딩은 HashEmbeddingService로 대체하므로 API를 호출하지 않습니다. 적재하는 벡터도 같은 방식으로
+    각 상품의 key_features에서 만들어 검색 질의와 실제처럼 유사도가 맞게 합니다 (검색 질의는 key_features
+    일부이므로 MIN_SCORE를 넘고, 필터 검색도 후보를 늘려가며 top_k를 채우는 실제 경로를 거침).
+    이 함수는 tools의 저장 위치와 전역 임베딩 서비스를 바꾸므로 벤치마크 전용 프로세스에서 호출해야 합니다.
+    """
+    set_embedding_service(HashEmbeddingService())
+    token_cache: dict[str, np.ndarray] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tools.configure_storage(Path(tmp))
+        tools.warm_up()
+
+        bulk_s = 0.0
+        for start in range(0, n, BULK_CHUNK):
+            entries = [synthetic_entry(i) for i in range(start, min(n, start + BULK_CHUNK))]
+            vectors = synthetic_entry_vectors(entries, token_cache)
+            # 벡터 생성 시간은 빼고 적재 시간만 측정
+            started = time.perf_counter()
+            tools.add_products_bulk(entries, vectors)
+            bulk_s += time.perf_counter() - started
+
+        started = time.perf_counter()
+        tools.checkpoint()
+        snapshot_s = time.perf_counter() - started
+
+        tools.configure_storage(Path(tmp))
+        started = time.perf_counter()
+        tools.warm_up()
+        startup_s = time.perf_counter() - started
+
+        rng = np.random.default_rng(SEED)
+        picks = rng.choice(n, size=min(n_queries, n), replace=False)
+        search_latencies: dict[str, list[float]] = {"unfiltered": [], "filtered": []}
+        # 질의 상품 자신이 결과에 포함된 비율. 낮으면 적재 벡터와 질의 임베딩이 맞지 않아 지연이 실제 경로가 아님
+        self_hits = {"unfiltered": 0, "filtered": 0}
+        for i in picks:
+            entry = synthetic_entry(int(i))
+            for mode, kwargs in (
+                ("unfiltered", {}),
+                ("filtered", {"country": entry["country"], "lang": entry["lang"]}),
+            ):
+                started = time.perf_counter()
+                response = json.loads(tools.search_local_db(entry["key_features"][1:], **kwargs))
+                search_latencies[mode].append((time.perf_counter() - started) * 1000)
+                names = [row.get("product_name") for row in response.get("results", [])]
+                self_hits[mode] += entry["product_name"] in names
+
+        started = time.perf_counter()
+        for i in range(n, n + n_saves):
+            entry = synthetic_entry(i)
+            tools.save_to_local_db(
+                entry["product_name"], entry["brand"], entry["category"], entry["key_features"],
+                "google_search", entry["country"], entry["lang"],
+            )
+        save_s = time.perf_counter() - started
+        # 임시 디렉토리를 지우기 전에 저널까지 스냅샷에 반영 (종료 시 저널 flush가 디렉토리를 다시 만들지 않게 함)
+        tools.checkpoint()
+
+        tools.configure_read_only(True)
+        tools.configure_storage(Path(tmp))
+        started = time.perf_counter()
+        tools.warm_up()
+        view_startup_s = time.perf_counter() - started
+        tools.configure_read_only(False)
+
+    return {
+        "products": n,
+        "bulk_insert_per_s": round(n / bulk_s, 1),
+        "snapshot_s": round(snapshot_s, 3),
+        "startup_s": round(startup_s, 3),
+        "readonly_startup_s": round(view_startup_s, 4),
+        "search": {
+            mode: {**_percentiles(latencies), "self_hit_rate": round(self_hits[mode] / max(len(latencies), 1), 3)}
+            for mode, latencies in search_latencies.items()
+        },
+        "save_per_s": round(n_saves / save_s, 1) if n_saves else None,
+    }
+
+
+def run(
+    sizes: tuple[int, ...] = DEFAULT_SIZES,
+    n_queries: int = DEFAULT_QUERIES,
+    k: int = DEFAULT_K,
+    connectivity: tuple[int, ...] = DEFAULT_CONNECTIVITY,
+    expansion_add: tuple[int, ...] = DEFAULT_EXPANSION_ADD,
+    expansion_search: tuple[int, ...] = DEFAULT_EXPANSION_SEARCH,
+    n_saves: int = DEFAULT_SAVES,
+    include_tools: bool = True,
+) -> dict:
+    """크기별로 합성 데이터를 만들어 인덱스 스윕과 도구 경로 측정을 수행하고 보고서를 반환합니다."""
+    results = []
+    for size in sizes:
+        print(f"[{size}] 합성 벡터 생성", flush=True)
+        vectors = synthetic_vectors(size)
+        queries = _queries(vectors, n_queries, SEED + 1)
+
+        print(f"[{size}] HNSW 파라미터 스윕", flush=True)
+        sweep = sweep_index(vectors, queries, k, connectivity, expansion_add, expansion_search)
+        for row in sweep:
+            print(
+                f"  M={row['connectivity']:<3} ef_add={row['expansion_add']:<4} ef_search={row['expansion_search']:<4}"
+                f" recall@{k}={row[f'recall@{k}']:.4f} p50={row['search']['p50_ms']:.3f}ms"
+                f" p99={row['search']['p99_ms']:.3f}ms insert={row['insert_per_s']:.0f}/s",
+                flush=True,
+            )
+
+        entry = {"size": size, "index_sweep": sweep}
+        if include_tools:
+            print(f"[{size}] 도구 경로 측정 (search_local_db / save_to_local_db)", flush=True)
+            entry["tools"] = bench_tools(size, n_queries, n_saves)
+        results.append(entry)
+
+    return {
+        "created_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "queries": n_queries,
+            "k": k,
+            "connectivity": list(connectivity),
+            "expansion_add": list(expansion_add),
+            "expansion_search": list(expansion_search),
+            "saves": n_saves,
+            "seed": SEED,
+        },
+        "results": results,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def _int_list(value: str) -> tuple[int, ...]:
+    return tuple(int(v) for v in value.split(",") if v.strip())
+
+
+def main(argv: list[str]) -> None:
+    options = {
+        "sizes": DEFAULT_SIZES,
+        "n_queries": DEFAULT_QUERIES,
+        "k": DEFAULT_K,
+        "connectivity": DEFAULT_CONNECTIVITY,
+        "expansion_add": DEFAULT_EXPANSION_ADD,
+        "expansion_search": DEFAULT_EXPANSION_SEARCH,
+        "n_saves": DEFAULT_SAVES,
+        "include_tools": True,
+    }
+    output_path = None
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--sizes" and i + 1 < len(argv):
+            options["sizes"] = _int_list(argv[i + 1])
+            i += 2
+        elif argv[i] == "--queries" and i + 1 < len(argv):
+            options["n_queries"] = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--k" and i + 1 < len(argv):
+            options["k"] = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--connectivity" and i + 1 < len(argv):
+            options["connectivity"] = _int_list(argv[i + 1])
+            i += 2
+        elif argv[i] == "--expansion-add" and i + 1 < len(argv):
+            options["expansion_add"] = _int_list(argv[i + 1])
+            i += 2
+        elif argv[i] == "--expansion-search" and i + 1 < len(argv):
+            options["expansion_search"] = _int_list(argv[i + 1])
+            i += 2
+        elif argv[i] == "--saves" and i + 1 < len(argv):
+            options["n_saves"] = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--index-only":
+            options["include_tools"] = False
+            i += 1
+        elif argv[i] == "--output" and i + 1 < len(argv):
+            output_path = Path(argv[i + 1])
+            i += 2
+        else:
+            i += 1
+
+    report = run(**options)
+
+    if output_path is None:
+        output_dir = Path("outputs")
+        output_dir.mkdir(exist_ok=True)
+        output_path = output_dir / f"benchmark_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n결과 저장: {output_path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / "datasets" / "cache"
+RESULT_CACHE_PATH = CACHE_DIR / "results.sqlite3"
+EMBEDDING_CACHE_PATH = CACHE_DIR / "embeddings.sqlite3"
+SEARCH_CACHE_PATH = CACHE_DIR / "search.sqlite3"
+
+DEFAULT_MAX_ENTRIES = 100_000
+# 768차원 float32 벡터 1개가 약 3KB이므로 5만 개 ≈ 150MB
+DEFAULT_MAX_EMBEDDINGS = 50_000
+DEFAULT_MAX_SEARCHES = 20_000
+DEFAULT_SEARCH_TTL = 7 * 24 * 3600  # seconds
+# 결과 캐시 적중 시 접근 시각(last_access)을 이 수만큼 모아서 한 번에 기록
+TOUCH_BATCH = 64
+# 같은 캐시 파일을 쓰는 다른 프로세스(batch/worker/serve)가 기록 중일 때 기다리는 최대 시간
+BUSY_TIMEOUT = 30.0  # seconds
+
+
+def connect_db(path: Path, check_same_thread: bool = True) -> sqlite3.Connection:
+    """캐시 SQLite 파일을 WAL 모드로 엽니다.
+
+    WAL에서는 읽기가 쓰기를 막지 않고, 쓰기 lock이 잡혀 있으면 "database is locked"로 바로 실패하지 않고
+    BUSY_TIMEOUT까지 기다립니다.
+    """
+    conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def make_result_key(image_bytes: bytes, country: str, lang: str, version: str) -> str:
+    """이미지 바이트 + 국가 + 언어 + 에이전트 버전으로 캐시 키(sha256)를 만듭니다."""
+    h = hashlib.sha256()
+    h.update(image_bytes)
+    for part in (country, lang, version):
+        h.update(b"\0")
+        h.update(part.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """분석 결과를 SQLite에 저장하는 내용 기반(content-addressed) LRU 캐시.
+
+    이벤트 루프를 막지 않도록 호출하는 쪽에서 asyncio.to_thread로 부르므로 연결 하나를 lock으로 보호합니다.
+    적중 시 접근 시각은 바로 커밋하지 않고 TOUCH_BATCH개씩 모아 기록하므로(다음 put에서도 함께 기록)
+    조회만으로는 쓰기 lock을 잡지 않습니다.
+    """
+
+    def __init__(self, path: Path = RESULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # LRU로 제거된 키 목록을 받는 함수 (근접 중복 인덱스가 제거된 결과를 가리키지 않게 함)
+        self.on_evict: Callable[[list[str]], None] | None = None
+        self._lock = threading.Lock()
+        # 아직 기록하지 않은 접근 시각 (키 → 마지막 적중 시각)
+        self._touched: dict[str, float] = {}
+        self._conn = connect_db(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_access ON results(last_access)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get(self, key: str) -> dict | None:
+        """캐시된 결과를 반환합니다. 없으면 None."""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                try:
+                    self._flush_touched()
+                except sqlite3.Error:
+                    # 접근 시각은 다음 기회에 기록하면 되므로 조회 결과에는 영향을 주지 않음
+                    pass
+        return json.loads(row[0])
+
+    def peek(self, key: str) -> dict | None:
+        """hit/miss 통계나 접근 시각을 바꾸지 않고 캐시된 결과를 조회합니다."""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _flush_touched(self) -> None:
+        touched = dict(self._touched)
+        try:
+            self._write_touched()
+            self._conn.commit()
+        except sqlite3.Error:
+            self._conn.rollback()
+            self._touched.update(touched)
+            raise
+
+    def _write_touched(self) -> None:
+        """모아 둔 접근 시각을 현재 트랜잭션에 기록합니다 (커밋은 호출하는 쪽에서)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE results SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def put(self, key: str, payload: dict) -> None:
+        """결과를 저장하고, 최대 개수를 넘으면 가장 오래 사용되지 않은 항목부터 제거합니다."""
+        with self._lock:
+            evicted = self._put(key, payload)
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+
+    def _put(self, key: str, payload: dict) -> list[str]:
+        now = time.time()
+        touched = dict(self._touched)
+        data = json.dumps(payload, ensure_ascii=False)
+        evicted: list[str] = []
+        try:
+            # 제거 대상을 고르기 전에 미뤄 둔 접근 시각을 반영
+            self._write_touched()
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO results (key, payload, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, now, now),
+            ).rowcount
+            if not added:
+                self._conn.execute("UPDATE results SET payload = ?, last_access = ? WHERE key = ?", (data, now, key))
+            excess = self._count + added - self.max_entries
+            if excess > 0:
+                evicted = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM results ORDER BY last_access ASC LIMIT ?", (excess,)
+                )]
+                self._conn.executemany("DELETE FROM results WHERE key = ?", [(key,) for key in evicted])
+            self._conn.commit()
+        except sqlite3.Error:
+            self._conn.rollback()
+            # 기록하지 못한 접근 시각은 다음에 다시 시도
+            self._touched.update(touched)
+            raise
+        self._count += added - len(evicted)
+        return evicted
+
+    def stats(self) -> dict:
+        """hit/miss 통계를 반환합니다."""
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count}
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._flush_touched()
+            except sqlite3.Error:
+                pass
+            self._conn.close()
+
+
+def make_embedding_key(model: str, dim: int, text: str) -> str:
+    """(모델, 차원, 텍스트 해시)로 임베딩 캐시 키를 만듭니다."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{dim}:{digest}"
+
+
+class EmbeddingCache:
+    """임베딩 벡터를 float32 BLOB으로 SQLite에 저장하는 LRU 캐시.
+
+    도구 함수가 다른 스레드에서 호출될 수 있으므로 연결 하나를 lock으로 보호합니다.
+    """
+
+    def __init__(self, path: Path = EMBEDDING_CACHE_PATH, max_entries: int = DEFAULT_MAX_EMBEDDINGS):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect_db(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """캐시에 있는 키의 벡터만 {키: 벡터}로 반환합니다."""
+        # 결과 캐시만 쓰는 경로(캐시 적중)에서 numpy를 불러오지 않도록 임베딩 캐시를 쓸 때 import
+        import numpy as np
+
+        if not keys:
+            return {}
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        """벡터들을 저장하고, 최대 개수를 넘으면 가장 오래 사용되지 않은 항목부터 제거합니다."""
+        import numpy as np
+
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, np.asarray(vec, dtype=np.float32).tobytes(), now) for key, vec in items.items()],
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """hit/miss 통계를 반환합니다."""
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count}
+
+
+def normalize_search_query(query: str) -> str:
+    """검색어 정규화: NFKC, casefold, 구두점 제거, 중복 제거 후 토큰 정렬.
+
+    어순이나 대소문자, 구두점만 다른 거의 같은 검색어가 같은 캐시 항목을 쓰게 합니다.
+    """
+    text = unicodedata.normalize("NFKC", query or "").casefold()
+    text = "".join(ch if ch.isalnum() else " " for ch in text)
+    return " ".join(sorted(set(text.split())))
+
+
+def make_search_key(query: str, country: str, lang: str) -> str:
+    """(정규화된 검색어, 국가, 언어)로 검색 캐시 키(sha256)를 만듭니다."""
+    raw = "\0".join((normalize_search_query(query), country.strip().casefold(), lang.strip().casefold()))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """웹 검색 결과를 TTL과 함께 SQLite에 저장하는 LRU 캐시.
+
+    만료된 항목은 조회 시 miss로 처리하고 저장 시 먼저 정리하며, 그래도 최대 개수를 넘으면
+    가장 오래 사용되지 않은 항목부터 제거합니다. 도구는 여러 태스크에서 호출되므로 lock으로 보호합니다.
+    """
+
+    def __init__(
+        self,
+        path: Path = SEARCH_CACHE_PATH,
+        ttl: float = DEFAULT_SEARCH_TTL,
+        max_entries: int = DEFAULT_MAX_SEARCHES,
+    ):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect_db(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            " key TEXT PRIMARY KEY,"
+            " query TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_searches_access ON searches(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_searches_expires ON searches(expires_at)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+
+    def get(self, key: str) -> dict | None:
+        """만료되지 않은 검색 결과를 반환합니다. 없거나 만료되었으면 None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM searches WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            try:
+                self._conn.execute("UPDATE searches SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            except sqlite3.Error:
+                # 접근 시각은 LRU 순서에만 쓰이므로 기록하지 못해도 조회 결과는 그대로 반환
+                self._conn.rollback()
+        return json.loads(row[0])
+
+    def put(self, key: str, query: str, payload: dict) -> None:
+        """검색 결과를 ttl초 동안 유효하게 저장합니다."""
+        now = time.time()
+        with self._lock:
+            count = self._count
+            try:
+                exists = self._conn.execute("SELECT 1 FROM searches WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO searches (key, query, payload, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, query, json.dumps(payload, ensure_ascii=False), now + self.ttl, now),
+                )
+                if exists is None:
+                    count += 1
+                if count > self.max_entries:
+                    count -= self._conn.execute("DELETE FROM searches WHERE expires_at <= ?", (now,)).rowcount
+                if count > self.max_entries:
+                    excess = count - self.max_entries
+                    self._conn.execute(
+                        "DELETE FROM searches WHERE key IN "
+                        "(SELECT key FROM searches ORDER BY last_access ASC LIMIT ?)",
+                        (excess,),
+                    )
+                    count -= excess
+                self._conn.commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+                raise
+            self._count = count
+
+    def stats(self) -> dict:
+        """hit/miss 통계를 반환합니다."""
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count}
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google import genai
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+EMBEDDING_DIM = 768
+
+# embed_content 1회 요청에 담을 최대 텍스트 수와, 요청을 모으기 위해 기다리는 시간
+DEFAULT_MAX_BATCH_SIZE = 100
+DEFAULT_MAX_WAIT_MS = 5.0
+
+MAX_RETRIES = 2
+RETRY_DELAY = 3  # seconds
+
+
+class _Request:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class EmbeddingService:
+    """동시에 들어온 임베딩 요청을 짧게 모아 한 번의 embed_content 호출로 처리하는 서비스.
+
+    genai.Client는 하나만 만들어 재사용하고, 백그라운드 스레드가 큐에서 요청을 꺼내
+    max_wait_ms 동안 또는 max_batch_size개가 찰 때까지 모은 뒤 일괄 요청합니다.
+    호출자는 submit()이 돌려주는 Future로 자기 몫의 벡터만 받습니다.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        model: str = EMBEDDING_MODEL,
+        dim: int = EMBEDDING_DIM,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.model = model
+        self.dim = dim
+        self._client: genai.Client | None = None
+        self._queue: queue.Queue[_Request] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "max_batch_size": 0}
+
+    @property
+    def client(self) -> genai.Client:
+        if self._client is None:
+            # google.genai는 import 비용이 커서 클라이언트를 처음 만들 때 불러옴
+            from google import genai
+
+            self._client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+        return self._client
+
+    def submit(self, texts: list[str]) -> Future:
+        """텍스트 목록을 큐에 넣고 벡터 목록을 돌려줄 Future를 반환합니다."""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+        self._ensure_started()
+        self._queue.put(request)
+        return request.future
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """submit() 후 결과를 기다리는 동기 버전."""
+        return self.submit(texts).result()
+
+    def stats(self) -> dict:
+        """요청/배치 통계를 반환합니다. avg_batch_size는 배치당 평균 텍스트 수입니다."""
+        stats = dict(self._stats)
+        stats["avg_batch_size"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: list[_Request]) -> None:
+        """모은 요청을 max_batch_size 단위로 나눠 호출하고 결과를 요청별로 돌려줍니다."""
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors: list[list[float]] = []
+            for start in range(0, len(texts), self.max_batch_size):
+                chunk = texts[start:start + self.max_batch_size]
+                vectors.extend(self._request(chunk))
+                self._stats["batches"] += 1
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(chunk))
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        self._stats["requests"] += len(batch)
+        self._stats["texts"] += len(texts)
+        offset = 0
+        for request in batch:
+            n = len(request.texts)
+            request.future.set_result(vectors[offset:offset + n])
+            offset += n
+
+    def _request(self, texts: list[str]) -> list[list[float]]:
+        """Gemini embedding API를 호출합니다. 실패 시 최대 2회 재시도합니다."""
+        from google.genai import types
+
+        last_error = None
+        for attempt in range(1, MAX_RETRIES + 2):
+            try:
+                result = self.client.models.embed_content(
+                    model=self.model,
+                    contents=texts,
+                    config=types.EmbedContentConfig(output_dimensionality=self.dim),
+                )
+                return [e.values for e in result.embeddings]
+            except Exception as e:
+                last_error = e
+                if attempt <= MAX_RETRIES:
+                    print(f"  !! Embedding API 오류 (시도 {attempt}/{MAX_RETRIES + 1}): {e}", flush=True)
+                    time.sleep(RETRY_DELAY)
+                else:
+                    raise last_error
+
+
+_service: EmbeddingService | None = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """프로세스 전역 EmbeddingService를 반환합니다 (싱글턴)."""
+    global _service
+    if _service is None:
+        _service = EmbeddingService()
+    return _service
+
+
+def configure_embedding_service(
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS
+) -> EmbeddingService:
+    """배치 크기와 대기 시간을 지정하여 전역 EmbeddingService를 새로 만듭니다."""
+    global _service
+    _service = EmbeddingService(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    return _service
+
+
+def set_embedding_service(service: EmbeddingService) -> EmbeddingService:
+    """전역 EmbeddingService를 교체합니다 (예: 벤치마크용 로컬 임베딩)."""
+    global _service
+    _service = service
+    return _service
@@ -0,0 +1,266 @@
+import csv
+import hashlib
+import itertools
+import json
+import queue
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from . import tools
+from .embedding import DEFAULT_MAX_BATCH_SIZE, EMBEDDING_DIM, EmbeddingService
+
+# 한 번에 임베딩/추가하는 행 수, 동시에 진행하는 임베딩 요청 수, 스냅샷(체크포인트) 간격
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_CONCURRENCY = 4
+DEFAULT_CHECKPOINT_ROWS = 20000
+PROGRESS_INTERVAL = 2.0  # seconds
+
+# CSV의 key_features 열은 이 구분자로 나눔 (JSON 배열 문자열도 허용)
+FEATURE_SEPARATOR = "|"
+
+
+def _parse_features(value) -> list[str]:
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    text = str(value or "").strip()
+    if text.startswith("["):
+        try:
+            return [str(v) for v in json.loads(text)]
+        except json.JSONDecodeError:
+            pass
+    return text.split(FEATURE_SEPARATOR)
+
+
+def read_records(path: Path) -> Iterator[dict | None]:
+    """CSV/TSV/JSONL 상품 파일을 한 행씩 읽습니다.
+
+    읽을 수 없는 행은 None으로 넘겨 행 번호(재개 위치)가 어긋나지 않게 합니다.
+    """
+    suffix = path.suffix.lower()
+    with path.open(encoding="utf-8-sig", newline="") as fp:
+        if suffix in (".csv", ".tsv"):
+            for row in csv.DictReader(fp, delimiter="\t" if suffix == ".tsv" else ","):
+                row["key_features"] = _parse_features(row.get("key_features"))
+                yield row
+        elif suffix in (".jsonl", ".ndjson"):
+            for line in fp:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    yield None
+                    continue
+                if not isinstance(record, dict):
+                    yield None
+                    continue
+                record["key_features"] = _parse_features(record.get("key_features"))
+                yield record
+        else:
+            raise ValueError(f"지원하지 않는 파일 형식입니다: {path.suffix} (csv, tsv, jsonl)")
+
+
+def _checkpoint_dir() -> Path:
+    """체크포인트 디렉터리. configure_storage()로 바뀐 저장 위치를 따르도록 호출할 때마다 계산합니다."""
+    return tools.VECTORDB_DIR / "ingest"
+
+
+def _checkpoint_path(path: Path) -> Path:
+    digest = hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return _checkpoint_dir() / f"{path.stem}.{digest}.json"
+
+
+def _load_checkpoint(path: Path) -> int:
+    """이전 실행이 스냅샷까지 반영한 행 수를 반환합니다. 파일이 줄어들었으면 처음부터 다시 읽습니다."""
+    state_path = _checkpoint_path(path)
+    if not state_path.exists():
+        return 0
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    if path.stat().st_size < state.get("size", 0):
+        print(f"  !! 원본 파일이 체크포인트 이후 줄어들어 처음부터 다시 적재합니다: {path}")
+        return 0
+    return int(state.get("rows", 0))
+
+
+def _save_checkpoint(path: Path, rows: int, done: bool) -> None:
+    state_path = _checkpoint_path(path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_name(state_path.name + ".tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {"source": str(path.resolve()), "size": path.stat().st_size, "rows": rows, "done": done},
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    tmp_path.replace(state_path)
+
+
+class _Chunk:
+    __slots__ = ("rows", "entries", "vectors", "invalid", "duplicates")
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.entries: list[dict] = []
+        self.vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.invalid = 0
+        self.duplicates = 0
+
+
+def _prepare(records: list[dict | None], services: "queue.Queue[EmbeddingService]") -> _Chunk:
+    """행을 정규화하고 이미 DB에 있는 상품을 거른 뒤 나머지를 임베딩합니다 (작업 스레드에서 실행)."""
+    chunk = _Chunk(len(records))
+    for record in records:
+        entry = tools.normalize_product(record) if record else None
+        if entry is None:
+            chunk.invalid += 1
+        elif tools.is_known_product(entry):
+            chunk.duplicates += 1
+        else:
+            chunk.entries.append(entry)
+    if chunk.entries:
+        # 대량 적재 텍스트로 질의용 임베딩 캐시를 밀어내지 않도록 캐시를 거치지 않고 직접 요청
+        service = services.get()
+        try:
+            vectors = service.embed([" ".join(entry["key_features"]) for entry in chunk.entries])
+        finally:
+            services.put(service)
+        chunk.vectors = np.asarray(vectors, dtype=np.float32)
+    return chunk
+
+
+def ingest(
+    path: Path,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint_rows: int = DEFAULT_CHECKPOINT_ROWS,
+    resume: bool = False,
+) -> dict:
+    """상품 파일을 스트리밍으로 읽어 Vector DB에 적재하고 통계를 반환합니다.
+
+    chunk_size 행씩 묶어 최대 concurrency개의 청크를 동시에 임베딩하고, 완료된 청크는 입력 순서대로
+    index.add로 한 번에 추가합니다. checkpoint_rows 행마다 스냅샷을 저장하고 처리한 행 수를 기록하므로
+    중단되어도 resume=True로 마지막 체크포인트부터 이어서 적재할 수 있습니다.
+    """
+    if tools.READ_ONLY:
+        raise RuntimeError("읽기 전용 모드에서는 적재할 수 없습니다.")
+
+    start_row = _load_checkpoint(path) if resume else 0
+    if start_row:
+        print(f"  [재개] {start_row}행까지 적재된 체크포인트부터 이어서 진행합니다.")
+    records = itertools.islice(read_records(path), start_row, None)
+
+    concurrency = max(1, concurrency)
+    # 임베딩 서비스마다 배치 스레드가 하나이므로 서비스 수가 곧 동시 API 요청 수
+    services: queue.Queue[EmbeddingService] = queue.Queue()
+    for _ in range(concurrency):
+        services.put(EmbeddingService(max_batch_size=min(chunk_size, DEFAULT_MAX_BATCH_SIZE), max_wait_ms=0))
+
+    stats = {"rows": start_row, "added": 0, "duplicates": 0, "invalid": 0}
+    committed_rows = start_row
+    started = time.perf_counter()
+    last_report = started
+    pending: deque[Future] = deque()
+
+    def report(final: bool = False) -> None:
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        rate = (stats["rows"] - start_row) / elapsed
+        prefix = "[완료]" if final else "[진행]"
+        print(
+            f"  {prefix} {stats['rows']}행 | 추가 {stats['added']} | 중복 {stats['duplicates']}"
+            f" | 무효 {stats['invalid']} | {rate:.1f} rows/s",
+            flush=True,
+        )
+
+    def commit(chunk: _Chunk) -> None:
+        nonlocal committed_rows, last_report
+        keys = tools.add_products_bulk(chunk.entries, chunk.vectors) if chunk.entries else []
+        added = sum(1 for key in keys if key is not None)
+        stats["added"] += added
+        stats["duplicates"] += chunk.duplicates + len(keys) - added
+        stats["invalid"] += chunk.invalid
+        stats["rows"] += chunk.rows
+        if stats["rows"] - committed_rows >= checkpoint_rows:
+            tools.checkpoint()
+            committed_rows = stats["rows"]
+            _save_checkpoint(path, committed_rows, done=False)
+        if time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+            report()
+            last_report = time.perf_counter()
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest")
+    done = False
+    # 스냅샷은 checkpoint_rows마다만 저장 (저널 크기에 따른 자동 압축이 DB 전체를 반복해서 다시 쓰지 않게 함)
+    with tools.suspend_compaction():
+        try:
+            while True:
+                batch = list(itertools.islice(records, chunk_size))
+                if batch:
+                    pending.append(executor.submit(_prepare, batch, services))
+                # 동시에 임베딩 중인 청크 수를 제한하고, 추가는 입력 순서대로 하여 체크포인트 행 번호를 단조 증가시킴
+                while pending and (len(pending) >= concurrency or not batch):
+                    commit(pending.popleft().result())
+                if not batch:
+                    break
+            done = True
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            # 중단되었더라도 추가까지 끝난 행은 스냅샷에 남기고 그 위치부터 재개하게 함
+            tools.checkpoint()
+            _save_checkpoint(path, stats["rows"], done=done)
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+    stats["rows_per_s"] = round((stats["rows"] - start_row) / max(stats["elapsed_s"], 1e-9), 1)
+    report(final=True)
+    return stats
+
+
+def main(argv: list[str]) -> None:
+    if not argv or argv[0].startswith("--"):
+        print("사용법: python -m analyzer.ingest <products.csv|products.jsonl> [--chunk-size N]")
+        print("        [--concurrency N] [--checkpoint-rows N] [--resume]")
+        sys.exit(1)
+
+    path = Path(argv[0])
+    if not path.is_file():
+        print(f"파일을 찾을 수 없습니다: {path}")
+        sys.exit(1)
+
+    chunk_size = DEFAULT_CHUNK_SIZE
+    concurrency = DEFAULT_CONCURRENCY
+    checkpoint_rows = DEFAULT_CHECKPOINT_ROWS
+    resume = False
+    i = 1
+    while i < len(argv):
+        if argv[i] == "--chunk-size" and i + 1 < len(argv):
+            chunk_size = max(1, int(argv[i + 1]))
+            i += 2
+        elif argv[i] == "--concurrency" and i + 1 < len(argv):
+            concurrency = max(1, int(argv[i + 1]))
+            i += 2
+        elif argv[i] == "--checkpoint-rows" and i + 1 < len(argv):
+            checkpoint_rows = max(1, int(argv[i + 1]))
+            i += 2
+        elif argv[i] == "--resume":
+            resume = True
+            i += 1
+        else:
+            i += 1
+
+    try:
+        ingest(path, chunk_size, concurrency, checkpoint_rows, resume)
+    except KeyboardInterrupt:
+        print("\n중단되었습니다. --resume 옵션으로 마지막 체크포인트부터 이어서 적재할 수 있습니다.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,226 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+DEFAULT_QUEUE_PATH = Path(__file__).resolve().parent.parent / "outputs" / "queue.sqlite3"
+# 워커가 이 시간 안에 갱신하지 않은 작업은 다른 워커가 가져감 (워커는 1/3 주기로 갱신)
+DEFAULT_LEASE_SECONDS = 300.0
+# lease가 이 횟수만큼 만료된 작업(워커를 죽게 만드는 이미지 등)은 더 가져가지 않고 실패 처리
+DEFAULT_MAX_ATTEMPTS = 3
+# enqueue 커밋 단위이자 export 조회 단위
+CHUNK_ROWS = 1000
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class Job:
+    id: int
+    path: str
+    country: str
+    lang: str
+    attempts: int
+
+
+class JobQueue:
+    """여러 호스트의 워커가 공유 파일시스템의 SQLite 파일 하나로 이미지 분석 작업을 나눠 처리하는 작업 큐.
+
+    작업 상태: pending → leased(owner, lease_until) → done | failed
+    - claim()은 BEGIN IMMEDIATE 트랜잭션 안에서 대기 작업(또는 lease가 만료된 작업)을 골라 lease를 잡으므로
+      같은 작업을 두 워커가 동시에 가져가지 않습니다.
+    - 경로는 큐에서 유일하며 done이 된 작업은 다시 대기 상태로 돌아가지 않습니다. lease를 잃은 워커가
+      늦게 결과를 보내도 먼저 기록된 done 결과를 덮어쓰지 않습니다.
+    - 분석 결과는 큐에 함께 저장되고 export()로 배치 결과와 같은 JSONL을 만듭니다.
+
+    WAL은 여러 호스트에서 공유 메모리를 쓸 수 없으므로 기본 rollback 저널을 사용합니다.
+    공유 파일시스템이 POSIX 파일 lock을 지원해야 합니다 (NFSv4, 로컬 디스크 등).
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_QUEUE_PATH,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # 트랜잭션을 직접 시작하도록 autocommit 모드로 열고, 다른 워커가 쓰는 동안은 timeout까지 기다림
+        self._conn = sqlite3.connect(str(path), timeout=60, isolation_level=None, check_same_thread=False)
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY,"
+                " path TEXT NOT NULL UNIQUE,"
+                " country TEXT NOT NULL,"
+                " lang TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                " owner TEXT,"
+                " lease_until REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " result TEXT,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_until)")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def enqueue(self, paths: Iterable[str], country: str = "KR", lang: str = "ko") -> int:
+        """작업을 추가하고 새로 추가된 수를 반환합니다. 이미 큐에 있는 경로는 상태와 관계없이 건너뜁니다.
+
+        paths는 스트림으로 소비하며 CHUNK_ROWS개씩 커밋하므로 워커는 추가가 끝나기 전에 시작할 수 있습니다.
+        """
+        added = 0
+        chunk: list[str] = []
+        for path in paths:
+            chunk.append(path)
+            if len(chunk) >= CHUNK_ROWS:
+                added += self._insert(chunk, country, lang)
+                chunk = []
+        if chunk:
+            added += self._insert(chunk, country, lang)
+        return added
+
+    def _insert(self, paths: list[str], country: str, lang: str) -> int:
+        now = time.time()
+        with self._lock, self._transaction():
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (path, country, lang, updated_at) VALUES (?, ?, ?, ?)",
+                [(path, country, lang, now) for path in paths],
+            )
+            return self._conn.total_changes - before
+
+    def claim(self, worker_id: str, limit: int = 1) -> list[Job]:
+        """대기 작업을 먼저, 없으면 lease가 만료된 작업을 최대 limit개 가져와 lease를 잡습니다."""
+        now = time.time()
+        with self._lock, self._transaction():
+            # 여러 번 lease가 만료된 작업은 다시 나눠주지 않음
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', owner = NULL, lease_until = NULL, result = ?, updated_at = ?"
+                " WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (
+                    json.dumps({"error": "lease_expired", "message": f"lease가 {self.max_attempts}회 만료되었습니다."}),
+                    now, now, self.max_attempts,
+                ),
+            )
+            rows = self._conn.execute(
+                "SELECT id, path, country, lang, attempts FROM jobs WHERE status = 'pending' ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+            if len(rows) < limit:
+                rows += self._conn.execute(
+                    "SELECT id, path, country, lang, attempts FROM jobs"
+                    " WHERE status = 'leased' AND lease_until < ? ORDER BY lease_until LIMIT ?",
+                    (now, limit - len(rows)),
+                ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1,"
+                " updated_at = ? WHERE id = ?",
+                [(worker_id, now + self.lease_seconds, now, row[0]) for row in rows],
+            )
+        return [Job(row[0], row[1], row[2], row[3], row[4] + 1) for row in rows]
+
+    def renew(self, worker_id: str) -> int:
+        """worker_id가 가진 모든 lease를 연장하고 그 수를 반환합니다."""
+        now = time.time()
+        with self._lock, self._transaction():
+            return self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE status = 'leased' AND owner = ?",
+                (now + self.lease_seconds, worker_id),
+            ).rowcount
+
+    def complete(self, job_id: int, result: dict) -> bool:
+        """결과를 기록합니다 (result에 error가 있으면 failed). 이미 done이면 기록하지 않고 False를 반환합니다.
+
+        lease가 만료되어 다른 워커가 가져간 작업이라도 먼저 끝낸 쪽의 결과가 남습니다.
+        """
+        status = "failed" if "error" in result else "done"
+        with self._lock, self._transaction():
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, owner = NULL, lease_until = NULL, updated_at = ?"
+                " WHERE id = ? AND status != 'done'",
+                (status, json.dumps(result, ensure_ascii=False), time.time(), job_id),
+            ).rowcount > 0
+
+    def release(self, worker_id: str) -> int:
+        """워커가 정상 종료할 때 끝내지 못한 작업을 시도 횟수를 되돌려 대기 상태로 돌려놓습니다."""
+        with self._lock, self._transaction():
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'pending', owner = NULL, lease_until = NULL,"
+                " attempts = MAX(attempts - 1, 0), updated_at = ? WHERE status = 'leased' AND owner = ?",
+                (time.time(), worker_id),
+            ).rowcount
+
+    def retry_failed(self) -> int:
+        """실패한 작업을 다시 대기 상태로 돌리고 그 수를 반환합니다."""
+        with self._lock, self._transaction():
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'pending', result = NULL, attempts = 0, updated_at = ?"
+                " WHERE status = 'failed'",
+                (time.time(),),
+            ).rowcount
+
+    def stats(self) -> dict:
+        """상태별 작업 수와 lease가 만료된 작업 수, 작업을 가진 워커 수를 반환합니다."""
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        with self._lock:
+            for status, count in self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = count
+            counts["expired"] = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_until < ?", (time.time(),)
+            ).fetchone()[0]
+            counts["workers"] = self._conn.execute(
+                "SELECT COUNT(DISTINCT owner) FROM jobs WHERE status = 'leased'"
+            ).fetchone()[0]
+        counts["total"] = counts["pending"] + counts["leased"] + counts["done"] + counts["failed"]
+        return counts
+
+    def export(self, path: Path) -> int:
+        """done/failed 작업의 결과를 배치 결과와 같은 JSONL 형식으로 저장하고 기록한 수를 반환합니다.
+
+        `index`는 큐에 추가된 순서이며, 이 파일은 main.py --resume에도 쓸 수 있습니다.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        written = 0
+        last_id = 0
+        with path.open("w", encoding="utf-8") as fp:
+            while True:
+                # 읽기 lock을 오래 잡아 워커의 기록을 막지 않도록 나눠서 조회
+                with self._lock:
+                    rows = self._conn.execute(
+                        "SELECT id, path, result FROM jobs WHERE id > ? AND status IN ('done', 'failed')"
+                        " ORDER BY id LIMIT ?",
+                        (last_id, CHUNK_ROWS),
+                    ).fetchall()
+                if not rows:
+                    break
+                for job_id, job_path, result in rows:
+                    record = {"index": job_id, "file": Path(job_path).name, "path": job_path, "result": json.loads(result)}
+                    fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+                written += len(rows)
+                last_id = rows[-1][0]
+        return written
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,154 @@
+import atexit
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+# 기록된 저널 레코드를 fsync하는 주기 (group commit)
+DEFAULT_COMMIT_INTERVAL = 1.0  # seconds
+
+
+class Journal:
+    """append-only JSONL 저널.
+
+    append()는 레코드를 바로 파일 끝에 한 번의 write로 붙여 같은 DB를 쓰는 다른 프로세스가
+    즉시 읽을 수 있게 하고, fsync는 백그라운드 스레드가 commit_interval마다 (그리고 프로세스
+    종료 시) 모아서 한 번에 수행합니다. 여러 번의 저장이 한 번의 fsync로 처리됩니다.
+    on_flush는 fsync 직후 호출되어 압축(compaction) 여부를 판단합니다.
+
+    offset은 이 프로세스가 읽었거나 직접 기록한 위치로, read_new()는 그 뒤에 다른 프로세스가
+    추가한 레코드만 읽습니다.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        commit_interval: float = DEFAULT_COMMIT_INTERVAL,
+        on_flush: Callable[["Journal"], None] | None = None,
+    ):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.on_flush = on_flush
+        self.offset = 0
+        self._count = 0
+        self._dirty = 0
+        self._fd: int | None = None
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._closed = threading.Event()
+        atexit.register(self.flush)
+
+    def __len__(self) -> int:
+        """마지막 truncate 이후 읽었거나 기록한 레코드 수."""
+        return self._count
+
+    def _open(self) -> int:
+        if self._fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def append(self, record: dict) -> None:
+        self.append_many([record])
+
+    def append_many(self, records: list[dict]) -> None:
+        """레코드들을 한 번의 write로 파일 끝에 붙입니다.
+
+        다른 프로세스와 섞이지 않도록 호출자가 프로세스 간 lock을 잡은 상태에서 호출해야 하며,
+        그 사이 다른 프로세스의 기록은 read_new()로 먼저 읽어 두어야 offset이 어긋나지 않습니다.
+        """
+        if not records:
+            return
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        with self._lock:
+            fd = self._open()
+            if os.fstat(fd).st_size > self.offset:
+                # lock을 잡은 상태에서 offset 뒤에 남은 바이트는 중단된 기록의 잘린 줄이므로 새 줄에서 시작
+                data = b"\n" + data
+            os.write(fd, data)
+            self.offset = os.lseek(fd, 0, os.SEEK_END)
+            self._count += len(records)
+            self._dirty += len(records)
+        if self._thread is None:
+            self._start()
+
+    def flush(self) -> int:
+        """기록된 레코드를 fsync하고 그 수를 반환합니다."""
+        with self._lock:
+            if not self._dirty or self._fd is None:
+                return 0
+            os.fsync(self._fd)
+            dirty, self._dirty = self._dirty, 0
+        return dirty
+
+    def read_new(self) -> list[dict]:
+        """offset 이후에 기록된 레코드를 읽고 offset을 옮깁니다.
+
+        다른 프로세스가 쓰는 중인 마지막 줄(개행 없음)은 다음 호출에서 읽고, 기록 도중 중단되어
+        깨진 줄은 무시합니다.
+        """
+        with self._lock:
+            try:
+                if os.stat(self.path).st_size <= self.offset:
+                    return []
+            except FileNotFoundError:
+                return []
+            with self.path.open("rb") as fp:
+                fp.seek(self.offset)
+                data = fp.read()
+            end = data.rfind(b"\n") + 1
+            if not end:
+                return []
+            self.offset += end
+            records = []
+            for line in data[:end].splitlines():
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+            self._count += len(records)
+        return records
+
+    def rewind(self) -> None:
+        """다른 프로세스가 압축한 스냅샷을 새로 로드할 때 호출하여 처음부터 다시 읽게 합니다."""
+        with self._lock:
+            self.offset = 0
+            self._count = 0
+
+    def truncate(self) -> None:
+        """스냅샷이 저널 내용을 모두 반영한 뒤 호출하여 저널을 비웁니다 (프로세스 간 lock 필요)."""
+        with self._lock:
+            fd = self._open()
+            os.ftruncate(fd, 0)
+            os.fsync(fd)
+            self.offset = 0
+            self._count = 0
+            self._dirty = 0
+
+    def close(self) -> None:
+        """기록을 fsync하고 파일을 닫습니다.
+
+        종료 시 flush 등록을 해제하고 commit 스레드도 멈추어 닫힌 저널이 프로세스에 남지 않게 합니다.
+        """
+        atexit.unregister(self.flush)
+        self._closed.set()
+        self.flush()
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None and not self._closed.is_set():
+                self._thread = threading.Thread(target=self._run, name="journal-commit", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.commit_interval):
+            if self.flush() and self.on_flush is not None:
+                try:
+                    self.on_flush(self)
+                except Exception as e:
+                    print(f"  !! 저널 압축 실패: {e}", flush=True)
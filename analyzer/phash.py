@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import io
+import sqlite3
+import sys
+import threading
+from itertools import combinations
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .cache import RESULT_CACHE_PATH, connect_db
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+HASH_BITS = 64
+CHUNK_COUNT = 4
+CHUNK_BITS = HASH_BITS // CHUNK_COUNT
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+DEFAULT_THRESHOLD = 4
+# 1인 비트가 이 수보다 적거나 (64 - 이 수)보다 많은 해시는 단색/투명/흰 배경처럼 밝기 변화가 거의 없는
+# 이미지로, 서로 다른 상품도 같은 해시가 되므로 근접 중복 판정에 쓰지 않음
+MIN_HASH_BITS = 8
+
+
+def dhash(image: Image.Image) -> int:
+    """이미지의 64비트 difference hash(dHash)를 계산합니다.
+
+    9x8 흑백으로 축소한 뒤 가로로 이웃한 픽셀의 밝기 대소를 비트로 기록하므로
+    재인코딩·리사이즈·경미한 크롭에도 값이 거의 변하지 않습니다.
+    """
+    from PIL import Image
+
+    small = image.convert("L").resize((9, 8), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def dhash_bytes(image_bytes: bytes) -> int:
+    """이미지 바이트를 디코딩하여 dHash를 계산합니다."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return dhash(img)
+
+
+def is_informative(value: int) -> bool:
+    """근접 중복 판정에 쓸 만큼 밝기 변화가 있는 해시인지 확인합니다."""
+    return MIN_HASH_BITS <= value.bit_count() <= HASH_BITS - MIN_HASH_BITS
+
+
+def _to_signed(value: int) -> int:
+    """SQLite INTEGER(부호 있는 64비트)에 저장할 수 있도록 변환합니다."""
+    return value - (1 << HASH_BITS) if value >= (1 << (HASH_BITS - 1)) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def _chunk_neighbors(value: int, radius: int):
+    """CHUNK_BITS 비트 값에서 해밍 거리 radius 이내의 모든 값을 생성합니다."""
+    for r in range(radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            flipped = value
+            for b in bits:
+                flipped ^= 1 << b
+            yield flipped
+
+
+def _chunks(value: int):
+    """해시를 (청크 번호, CHUNK_BITS 비트 청크 값)으로 나눕니다."""
+    for i in range(CHUNK_COUNT):
+        yield i, (value >> (i * CHUNK_BITS)) & CHUNK_MASK
+
+
+class PerceptualIndex:
+    """dHash 기반 근접 중복 이미지 인덱스 (multi-index hashing).
+
+    64비트 해시를 16비트 청크 4개로 나누어 청크별 버킷에 등록합니다.
+    해밍 거리가 r 이하인 두 해시는 비둘기집 원리에 따라 적어도 한 청크의 거리가
+    r // 4 이하이므로, 그 범위의 버킷만 살펴보면 전체 스캔 없이 후보를 찾을 수 있습니다.
+    각 항목은 결과 캐시(ResultCache)의 키를 가리키며, 결과가 캐시에서 제거되면 discard()로 함께 제거합니다.
+    밝기 변화가 거의 없는 해시(is_informative()가 False)는 등록하거나 조회하지 않습니다.
+    SQLite 쓰기가 다른 프로세스의 lock을 기다릴 수 있으므로 호출하는 쪽에서 asyncio.to_thread로 부르며,
+    메모리 인덱스와 연결은 lock 하나로 보호합니다.
+    """
+
+    def __init__(self, path: Path = RESULT_CACHE_PATH, threshold: int = DEFAULT_THRESHOLD):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.near_hits = 0
+        self._lock = threading.Lock()
+        self._conn = connect_db(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS phashes ("
+            " result_key TEXT PRIMARY KEY,"
+            " hash INTEGER NOT NULL,"
+            " scope TEXT NOT NULL)"
+        )
+        has_results = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'results'"
+        ).fetchone()
+        if has_results:
+            # 다른 프로세스의 LRU 제거 등으로 결과가 이미 사라진 항목은 정리
+            self._conn.execute("DELETE FROM phashes WHERE result_key NOT IN (SELECT key FROM results)")
+        self._conn.commit()
+
+        # 결과 키 → (해시, scope). 버킷은 청크 값 → 결과 키 목록
+        self._entries: dict[str, tuple[int, str]] = {}
+        self._buckets: list[dict[int, list[str]]] = [{} for _ in range(CHUNK_COUNT)]
+        for result_key, value, scope in self._conn.execute("SELECT result_key, hash, scope FROM phashes"):
+            value = _to_unsigned(value)
+            if is_informative(value):
+                self._insert(value, sys.intern(scope), result_key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _insert(self, value: int, scope: str, result_key: str) -> None:
+        """메모리 인덱스에 항목을 등록합니다."""
+        self._entries[result_key] = (value, scope)
+        for i, chunk in _chunks(value):
+            self._buckets[i].setdefault(chunk, []).append(result_key)
+
+    def add(self, value: int, scope: str, result_key: str) -> None:
+        """해시를 인덱스와 디스크에 등록합니다. 이미 등록된 결과 키와 판정에 쓰지 않는 해시는 무시합니다."""
+        if not is_informative(value):
+            return
+        # 동일한 scope 문자열을 하나의 객체로 공유하여 수백만 항목에서도 메모리를 줄임
+        scope = sys.intern(scope)
+        with self._lock:
+            if result_key in self._entries:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO phashes (result_key, hash, scope) VALUES (?, ?, ?)",
+                    (result_key, _to_signed(value), scope),
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+                raise
+            self._insert(value, scope, result_key)
+
+    def discard(self, result_key: str) -> None:
+        """캐시에서 제거된 결과를 가리키는 항목을 삭제합니다."""
+        self.discard_many([result_key])
+
+    def discard_many(self, result_keys: list[str]) -> None:
+        """캐시에서 제거된 결과들을 가리키는 항목을 메모리 인덱스와 디스크에서 삭제합니다 (ResultCache.on_evict).
+
+        디스크 삭제가 실패해도 메모리에서는 제거되며, 남은 행은 다음에 인덱스를 열 때 정리됩니다.
+        """
+        with self._lock:
+            removed = []
+            for result_key in result_keys:
+                entry = self._entries.pop(result_key, None)
+                if entry is None:
+                    continue
+                removed.append((result_key,))
+                for i, chunk in _chunks(entry[0]):
+                    bucket = self._buckets[i].get(chunk)
+                    if bucket is None:
+                        continue
+                    bucket.remove(result_key)
+                    if not bucket:
+                        del self._buckets[i][chunk]
+            if removed:
+                try:
+                    self._conn.executemany("DELETE FROM phashes WHERE result_key = ?", removed)
+                    self._conn.commit()
+                except sqlite3.Error:
+                    self._conn.rollback()
+
+    def find(self, value: int, scope: str) -> tuple[str, int] | None:
+        """같은 scope에서 해밍 거리가 threshold 이하인 가장 가까운 항목의 (결과 키, 거리)를 반환합니다.
+
+        판정에 쓰지 않는 해시(단색/흰 배경 등)는 항상 None입니다.
+        """
+        if not is_informative(value):
+            return None
+        with self._lock:
+            return self._find(value, scope)
+
+    def _find(self, value: int, scope: str) -> tuple[str, int] | None:
+        radius = self.threshold // CHUNK_COUNT
+        best: tuple[str, int] | None = None
+        seen: set[str] = set()
+        for i, chunk in _chunks(value):
+            bucket = self._buckets[i]
+            for neighbor in _chunk_neighbors(chunk, radius):
+                for result_key in bucket.get(neighbor, ()):
+                    if result_key in seen:
+                        continue
+                    seen.add(result_key)
+                    entry_hash, entry_scope = self._entries[result_key]
+                    if entry_scope != scope:
+                        continue
+                    distance = (entry_hash ^ value).bit_count()
+                    if distance <= self.threshold and (best is None or distance < best[1]):
+                        best = (result_key, distance)
+                        if distance == 0:
+                            return best
+        return best
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .phash import dhash
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+DEFAULT_MAX_EDGE = 1536
+DEFAULT_FORMAT = "jpeg"
+DEFAULT_QUALITY = 85
+
+OUTPUT_FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+# 재인코딩 이득이 없을 때 원본 그대로 보내도 되는 형식
+PASSTHROUGH_MIME_TYPES = {"image/jpeg", "image/png", "image/webp"}
+
+
+@dataclass(frozen=True)
+class PreprocessOptions:
+    """업로드 전 이미지 전처리 설정. format="original"이면 재인코딩하지 않습니다."""
+
+    max_edge: int = DEFAULT_MAX_EDGE
+    format: str = DEFAULT_FORMAT
+    quality: int = DEFAULT_QUALITY
+
+    def signature(self) -> str:
+        """캐시 키에 포함할 설정 문자열. 설정이 바뀌면 모델 입력이 달라지므로 캐시도 분리됩니다."""
+        if self.format == "original":
+            return "original"
+        return f"{self.format}:{self.max_edge}:{self.quality}"
+
+
+@dataclass
+class PreparedImage:
+    """전처리 결과. 한 번의 디코딩에서 해상도와 dHash를 함께 얻습니다."""
+
+    data: bytes
+    mime_type: str
+    resolution: str
+    image_hash: int | None
+    original_bytes: int
+    sent_bytes: int
+
+    @property
+    def grown(self) -> bool:
+        """축소/회전 후 재인코딩한 결과가 원본보다 커졌는지 여부 (원본이 이미 강하게 압축된 경우)."""
+        return self.sent_bytes > self.original_bytes
+
+
+def _flatten_alpha(img: Image.Image) -> Image.Image:
+    """투명 채널을 흰 배경에 합성하여 RGB로 변환합니다."""
+    from PIL import Image
+
+    if img.mode == "P" and "transparency" in img.info:
+        img = img.convert("RGBA")
+    if img.mode in ("RGBA", "LA"):
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB") if img.mode != "RGB" else img
+
+
+def prepare_image(image_bytes: bytes, mime_type: str, options: PreprocessOptions) -> PreparedImage:
+    """이미지를 한 번 디코딩하여 EXIF 회전 보정, 축소, 알파 제거, 재인코딩을 수행합니다.
+
+    디코딩에 실패하면 원본 바이트를 그대로 보내고 해상도는 'unknown'으로 기록합니다.
+    PIL은 캐시 적중만으로 끝나는 실행이 불러오지 않도록 처음 전처리할 때 import합니다.
+    """
+    from PIL import Image, ImageOps
+
+    original_size = len(image_bytes)
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as src:
+            src.load()
+            resolution = f"{src.width}x{src.height}"
+            orientation = src.getexif().get(0x0112, 1)  # EXIF Orientation 태그
+            img = ImageOps.exif_transpose(src)
+            image_hash = dhash(img)
+
+            if options.format == "original":
+                return PreparedImage(image_bytes, mime_type, resolution, image_hash, original_size, original_size)
+
+            pil_format, out_mime = OUTPUT_FORMATS[options.format]
+            geometry_changed = orientation not in (None, 1)
+            if max(img.size) > options.max_edge:
+                img.thumbnail((options.max_edge, options.max_edge), Image.LANCZOS)
+                geometry_changed = True
+            img = _flatten_alpha(img)
+
+            buf = io.BytesIO()
+            img.save(buf, format=pil_format, quality=options.quality)
+            encoded = buf.getvalue()
+    except Exception:
+        return PreparedImage(image_bytes, mime_type, "unknown", None, original_size, original_size)
+
+    # 이미 작은 JPEG/PNG/WebP는 재인코딩해도 줄지 않으므로 원본을 그대로 사용
+    if len(encoded) >= original_size and not geometry_changed and mime_type in PASSTHROUGH_MIME_TYPES:
+        return PreparedImage(image_bytes, mime_type, resolution, image_hash, original_size, original_size)
+
+    # 축소/회전한 경우에는 원본을 보낼 수 없으므로 더 커지더라도 재인코딩 결과를 보냄 (PreparedImage.grown으로 집계)
+    return PreparedImage(encoded, out_mime, resolution, image_hash, original_size, len(encoded))
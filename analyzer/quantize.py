@@ -0,0 +1,153 @@
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from usearch.index import Index
+
+from . import tools
+from .embedding import EMBEDDING_DIM
+
+DTYPES = ("f32", "f16", "i8")
+DEFAULT_QUERIES = 200
+DEFAULT_K = 3
+# 질의 벡터는 저장된 벡터에 잡음을 더해 만듦 (API 호출 없이 "비슷하지만 같지 않은" 질의를 흉내냄)
+QUERY_NOISE = 0.05
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def exact_top_k(queries: np.ndarray, vectors: np.ndarray, keys: np.ndarray, k: int, chunk: int = 65536) -> np.ndarray:
+    """numpy 전수 비교로 코사인 유사도 상위 k개 키를 구합니다 (recall 기준값).
+
+    DB를 chunk 단위로 나눠 누적 top-k만 유지하므로 메모리는 질의 수 × chunk에 비례합니다.
+    """
+    q = normalize_rows(queries.astype(np.float32))
+    best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+    best_keys = np.zeros((len(q), 0), dtype=np.uint64)
+    for start in range(0, len(vectors), chunk):
+        block = normalize_rows(vectors[start:start + chunk].astype(np.float32))
+        scores = np.concatenate([best_scores, q @ block.T], axis=1)
+        cand_keys = np.concatenate([best_keys, np.broadcast_to(keys[start:start + chunk], (len(q), len(block)))], axis=1)
+        take = min(k, scores.shape[1])
+        top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_keys = np.take_along_axis(cand_keys, top, axis=1)
+    return best_keys
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray, k: int) -> float:
+    hits = sum(len(set(map(int, f[:k])) & set(map(int, e[:k]))) for f, e in zip(found, expected))
+    return round(hits / (len(expected) * k), 4)
+
+
+def evaluate_dtypes(
+    dtypes: tuple[str, ...] = DTYPES,
+    n_queries: int = DEFAULT_QUERIES,
+    k: int = DEFAULT_K,
+    seed: int = 0,
+) -> list[dict]:
+    """현재 DB 벡터로 dtype별 인덱스를 만들어 recall@k, 검색 지연, 메모리/디스크 크기를 측정합니다.
+
+    기준값은 float32 벡터에 대한 numpy 전수 비교입니다. 현재 인덱스가 이미 양자화되어 있으면
+    기준 벡터도 양자화된 값에서 복원된 것이므로 결과를 해석할 때 주의해야 합니다.
+    """
+    keys, vectors = tools.export_vectors()
+    if len(keys) == 0:
+        raise ValueError("로컬 DB에 벡터가 없습니다.")
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = normalize_rows(vectors[picks]) + QUERY_NOISE * rng.standard_normal((len(picks), EMBEDDING_DIM))
+    queries = normalize_rows(queries).astype(np.float32)
+    expected = exact_top_k(queries, vectors, keys, k)
+
+    rows = []
+    for dtype in dtypes:
+        index = Index(ndim=EMBEDDING_DIM, metric="cos", dtype=dtype)
+        started = time.perf_counter()
+        index.add(keys, vectors, threads=0)
+        build_s = time.perf_counter() - started
+
+        latencies = []
+        # 결과가 k개 미만일 때 실제 키(0 포함)와 겹치지 않도록 최댓값으로 채움
+        found = np.full((len(queries), k), np.iinfo(np.uint64).max, dtype=np.uint64)
+        for i, query in enumerate(queries):
+            started = time.perf_counter()
+            result = index.search(query, k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found[i, :len(result.keys)] = result.keys
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / f"index.{dtype}.usearch"
+            index.save(str(path))
+            disk_bytes = path.stat().st_size
+
+        rows.append({
+            "dtype": dtype,
+            "vectors": int(len(keys)),
+            f"recall@{k}": recall_at_k(found, expected, k),
+            "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+            "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+            "build_s": round(build_s, 3),
+            "memory_bytes": int(index.memory_usage),
+            "disk_bytes": int(disk_bytes),
+        })
+    return rows
+
+
+def _print_report(rows: list[dict], k: int) -> None:
+    print(f"{'dtype':<6} {'recall@' + str(k):>9} {'p50(ms)':>9} {'p95(ms)':>9} {'memory(MB)':>11} {'disk(MB)':>9}")
+    for row in rows:
+        print(
+            f"{row['dtype']:<6} {row[f'recall@{k}']:>9.4f} {row['latency_ms_p50']:>9.3f} {row['latency_ms_p95']:>9.3f}"
+            f" {row['memory_bytes'] / 1e6:>11.1f} {row['disk_bytes'] / 1e6:>9.1f}"
+        )
+
+
+def main(argv: list[str]) -> None:
+    if not argv or argv[0] not in ("evaluate", "convert"):
+        print("사용법: python -m analyzer.quantize evaluate [--queries N] [--k K]")
+        print("        python -m analyzer.quantize convert <f32|f16|i8>")
+        sys.exit(1)
+
+    if argv[0] == "convert":
+        if len(argv) < 2 or argv[1] not in DTYPES:
+            print(f"변환할 dtype을 지정하세요: {', '.join(DTYPES)}")
+            sys.exit(1)
+        result = tools.convert_index_dtype(argv[1])
+        print(f"인덱스 변환 완료: {result['from']} → {result['to']} ({result['vectors']}개, {result['bytes']} bytes)")
+        return
+
+    n_queries = DEFAULT_QUERIES
+    k = DEFAULT_K
+    i = 1
+    while i < len(argv):
+        if argv[i] == "--queries" and i + 1 < len(argv):
+            n_queries = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--k" and i + 1 < len(argv):
+            k = int(argv[i + 1])
+            i += 2
+        else:
+            i += 1
+
+    rows = evaluate_dtypes(n_queries=n_queries, k=k)
+    _print_report(rows, k)
+
+    output_dir = Path("outputs")
+    output_dir.mkdir(exist_ok=True)
+    output_path = output_dir / f"quantize_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n결과 저장: {output_path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
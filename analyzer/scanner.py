@@ -0,0 +1,112 @@
+import json
+import os
+import random
+import sys
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterable, Iterator
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff"}
+MANIFEST_EXTENSIONS = {".txt", ".lst", ".jsonl"}
+
+
+def _matches(rel_path: str, patterns: list[str]) -> bool:
+    """상대 경로 또는 파일명이 glob 패턴 중 하나와 일치하는지 확인합니다."""
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(fnmatch(rel_path, p) or fnmatch(name, p) for p in patterns)
+
+
+def _accept(rel_path: str, include: list[str], exclude: list[str]) -> bool:
+    if Path(rel_path).suffix.lower() not in IMAGE_EXTENSIONS:
+        return False
+    if include and not _matches(rel_path, include):
+        return False
+    return not (exclude and _matches(rel_path, exclude))
+
+
+def scan_directory(
+    root: Path,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    recursive: bool = True,
+) -> Iterator[Path]:
+    """디렉토리를 깊이 우선으로 순회하며 이미지 경로를 하나씩 생성합니다.
+
+    파일은 os.scandir가 돌려주는 순서대로 바로 넘겨주므로 수백만 개의 파일이 있는 디렉토리에서도
+    전체를 읽기 전에 첫 이미지를 넘겨줄 수 있습니다 (순서는 파일시스템 순서). 하위 디렉토리는
+    현재 디렉토리를 다 읽은 뒤 이름순으로 방문합니다.
+    include/exclude는 root 기준 상대 경로(또는 파일명)에 대한 glob 패턴이며,
+    exclude에 걸린 디렉토리는 하위까지 건너뜁니다.
+    """
+    include = include or []
+    exclude = exclude or []
+    stack = [(root, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    rel_path = f"{prefix}{entry.name}"
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not (exclude and _matches(rel_path, exclude)):
+                            subdirs.append((Path(entry.path), f"{rel_path}/"))
+                    elif entry.is_file() and _accept(rel_path, include, exclude):
+                        yield Path(entry.path)
+        except OSError as e:
+            print(f"  !! 디렉토리를 읽을 수 없습니다: {directory} ({e})", flush=True)
+            continue
+        # 스택이므로 역순으로 넣어야 이름순으로 방문함
+        subdirs.sort(key=lambda item: item[1])
+        stack.extend(reversed(subdirs))
+
+
+def read_manifest(
+    source: str,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+) -> Iterator[Path]:
+    """매니페스트(경로 목록)에서 이미지 경로를 하나씩 생성합니다.
+
+    source가 "-"이면 표준 입력을 읽습니다. 각 줄은 경로 문자열이거나
+    `{"path": ...}` 형태의 JSON 객체이며, 빈 줄과 `#` 주석은 무시합니다.
+    """
+    include = include or []
+    exclude = exclude or []
+    fp = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    line = str(json.loads(line).get("path", ""))
+                except json.JSONDecodeError:
+                    continue
+                if not line:
+                    continue
+            if _accept(Path(line).as_posix(), include, exclude):
+                yield Path(line)
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+
+
+def is_manifest(target: str) -> bool:
+    """대상이 매니페스트(표준 입력 또는 경로 목록 파일)인지 확인합니다."""
+    return target == "-" or (Path(target).is_file() and Path(target).suffix.lower() in MANIFEST_EXTENSIONS)
+
+
+def reservoir_sample(items: Iterable[Path], k: int, rng: random.Random | None = None) -> list[Path]:
+    """전체 목록을 메모리에 올리지 않고 k개를 균등 확률로 뽑습니다 (reservoir sampling, Algorithm R)."""
+    rng = rng or random.Random()
+    reservoir: list[Path] = []
+    for n, item in enumerate(items):
+        if n < k:
+            reservoir.append(item)
+        else:
+            j = rng.randint(0, n)
+            if j < k:
+                reservoir[j] = item
+    return reservoir
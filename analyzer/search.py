@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Protocol
+
+from google import genai
+from google.adk.tools import ToolContext
+from google.genai import types
+
+from .cache import DEFAULT_SEARCH_TTL, SearchCache, make_search_key, normalize_search_query
+from .tracing import span
+
+SEARCH_MODEL = "gemini-2.5-flash"
+MAX_SOURCES = 8
+
+
+class SearchBackend(Protocol):
+    """웹 검색 백엔드. {"text": 요약, "sources": [{"title", "uri"}]}를 반환합니다."""
+
+    async def search(self, query: str, country: str, lang: str) -> dict: ...
+
+
+class GeminiSearchBackend:
+    """Gemini의 Google Search grounding으로 검색하고 요약과 출처를 돌려주는 기본 백엔드."""
+
+    def __init__(self, model: str = SEARCH_MODEL):
+        self.model = model
+        self.calls = 0
+        self._client: genai.Client | None = None
+
+    @property
+    def client(self) -> genai.Client:
+        if self._client is None:
+            self._client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+        return self._client
+
+    async def search(self, query: str, country: str, lang: str) -> dict:
+        self.calls += 1
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=(
+                f"Search the web for: {query}\n"
+                f"Target market: country={country}, language={lang}.\n"
+                "Summarize the facts that identify the product (official product name, "
+                "manufacturer brand, category, package text) and keep it short."
+            ),
+            config=types.GenerateContentConfig(tools=[types.Tool(google_search=types.GoogleSearch())]),
+        )
+        sources = []
+        for candidate in response.candidates or []:
+            metadata = candidate.grounding_metadata
+            for chunk in (metadata.grounding_chunks or []) if metadata else []:
+                if chunk.web is not None:
+                    sources.append({"title": chunk.web.title or "", "uri": chunk.web.uri or ""})
+        return {"text": response.text or "", "sources": sources[:MAX_SOURCES]}
+
+
+class LocalSearchBackend:
+    """외부 호출 없이 미리 정한 결과를 돌려주는 검색 백엔드 (테스트/오프라인 실행용).
+
+    results는 정규화된 검색어(normalize_search_query) → 결과 dict 매핑이며,
+    JSONL 파일(`{"query": ..., "text": ..., "sources": [...]}` 한 줄에 하나)로도 만들 수 있습니다.
+    """
+
+    def __init__(self, results: dict[str, dict] | None = None):
+        self.results = {normalize_search_query(q): r for q, r in (results or {}).items()}
+        self.calls = 0
+
+    @classmethod
+    def from_jsonl(cls, path: Path) -> "LocalSearchBackend":
+        results = {}
+        with path.open(encoding="utf-8") as fp:
+            for line in fp:
+                if line.strip():
+                    record = json.loads(line)
+                    results[record["query"]] = {"text": record.get("text", ""), "sources": record.get("sources", [])}
+        return cls(results)
+
+    async def search(self, query: str, country: str, lang: str) -> dict:
+        self.calls += 1
+        return self.results.get(normalize_search_query(query), {"text": "", "sources": []})
+
+
+_backend: SearchBackend | None = None
+_cache: SearchCache | None = None
+_cache_ttl: float = DEFAULT_SEARCH_TTL
+
+
+def get_search_backend() -> SearchBackend:
+    """현재 검색 백엔드를 반환합니다 (기본: GeminiSearchBackend, 싱글턴)."""
+    global _backend
+    if _backend is None:
+        _backend = GeminiSearchBackend()
+    return _backend
+
+
+def get_search_cache() -> SearchCache | None:
+    """검색 결과 캐시를 반환합니다. TTL이 0 이하이면 캐시를 쓰지 않고 None을 반환합니다."""
+    global _cache
+    if _cache is None and _cache_ttl > 0:
+        _cache = SearchCache(ttl=_cache_ttl)
+    return _cache
+
+
+def configure_search(
+    backend: SearchBackend | None = None,
+    ttl: float | None = None,
+    cache: SearchCache | None = None,
+) -> None:
+    """검색 백엔드, 캐시 TTL(초, 0 이하면 비활성화), 캐시 인스턴스를 지정합니다."""
+    global _backend, _cache, _cache_ttl
+    if backend is not None:
+        _backend = backend
+    if ttl is not None:
+        _cache_ttl = ttl
+        if _cache is not None:
+            _cache.ttl = ttl
+        if ttl <= 0:
+            _cache = None
+    if cache is not None:
+        _cache = cache
+
+
+async def google_search(query: str, tool_context: ToolContext) -> str:
+    """Google 웹 검색으로 상품 정보를 찾습니다. 대상 국가/언어는 세션 설정을 따릅니다.
+
+    Args:
+        query: 검색어 (이미지에서 읽은 텍스트, 브랜드, 카테고리 등 가장 강한 단서)
+
+    Returns:
+        검색 요약(text)과 출처(sources) JSON 문자열
+    """
+    country = str(tool_context.state.get("country", "KR"))
+    lang = str(tool_context.state.get("lang", "ko"))
+    key = make_search_key(query, country, lang)
+    cache = get_search_cache()
+
+    if cache is not None:
+        # 캐시 조회/저장은 커밋이 다른 프로세스의 쓰기 lock을 기다릴 수 있으므로 이벤트 루프 밖에서 실행
+        with span("search_cache"):
+            try:
+                cached = await asyncio.to_thread(cache.get, key)
+            except sqlite3.Error as e:
+                print(f"  !! 검색 캐시 조회 실패 (miss로 처리): {e}", flush=True)
+                cached = None
+        if cached is not None:
+            return json.dumps({"query": query, **cached, "cached": True}, ensure_ascii=False)
+
+    with span("google_search"):
+        result = await get_search_backend().search(query, country, lang)
+    if cache is not None and result.get("text"):
+        try:
+            await asyncio.to_thread(cache.put, key, query, result)
+        except sqlite3.Error as e:
+            print(f"  !! 검색 캐시 저장 실패: {e}", flush=True)
+    return json.dumps({"query": query, **result, "cached": False}, ensure_ascii=False)
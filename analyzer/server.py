@@ -0,0 +1,248 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from .tracing import get_stage_metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CONCURRENCY = 4
+# 처리를 기다리는 요청이 이 수를 넘으면 503으로 거절
+DEFAULT_QUEUE_SIZE = 256
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 503: "Service Unavailable",
+}
+
+# 분석 요청 dict({"path", "country", "lang", "refresh"})를 받아 결과 dict를 돌려주는 함수
+Handler = Callable[[dict], Awaitable[dict]]
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisServer:
+    """분석 요청을 큐에 넣고 concurrency개의 워커가 동시에 처리하는 로컬 HTTP 서버 (HTTP/1.1, keep-alive).
+
+    POST /analyze  {"path": 이미지 경로, "country", "lang", "refresh"} → handler가 돌려준 결과 JSON
+    GET  /health   큐 길이, 처리 중/완료/실패 건수
+    GET  /metrics  단계별 지연 (Prometheus 텍스트)
+
+    응답을 기다리는 동안 클라이언트가 연결을 끊으면(EOF) 아직 처리를 시작하지 않은 요청은 취소됩니다.
+    경로는 서버 프로세스 기준으로 해석합니다. 에이전트/인덱스/클라이언트는 프로세스에 한 번 로드되어
+    요청 사이에 재사용되므로 요청당 지연은 모델 호출 시간에 가깝습니다.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self._queue: asyncio.Queue[tuple[dict, asyncio.Future]] = asyncio.Queue(maxsize=max(1, queue_size))
+
+    def stats(self) -> dict:
+        return {
+            "status": "ok",
+            "queued": self._queue.qsize(),
+            "active": self.active,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+        }
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_path: Path | None = None) -> None:
+        """TCP(host:port) 또는 Unix 소켓(unix_path)에서 요청을 받습니다. 취소될 때까지 반환하지 않습니다."""
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        if unix_path is not None:
+            unix_path.unlink(missing_ok=True)
+            server = await asyncio.start_unix_server(self._handle_connection, path=str(unix_path))
+            address = f"unix:{unix_path}"
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            address = f"http://{host}:{port}"
+        print(f"분석 서버 시작: {address} (동시 처리 {self.concurrency}개)", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if unix_path is not None:
+                unix_path.unlink(missing_ok=True)
+
+    async def _worker(self) -> None:
+        while True:
+            request, future = await self._queue.get()
+            if future.cancelled():
+                # 응답을 기다리던 연결이 이미 끊긴 요청 (_await_result가 취소)
+                self.cancelled += 1
+                self._queue.task_done()
+                continue
+            self.active += 1
+            try:
+                result = await self.handler(request)
+            except Exception as e:
+                result = {"error": "analysis_failed", "message": str(e)}
+            finally:
+                self.active -= 1
+                self._queue.task_done()
+            if "error" in result:
+                self.failed += 1
+            else:
+                self.processed += 1
+            if not future.done():
+                future.set_result(result)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # 결과를 기다리는 동안 연결 상태를 확인하느라 먼저 읽은 다음 요청의 바이트
+        pending = bytearray()
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader, pending)
+                except _BadRequest as e:
+                    _write_response(writer, e.status, {"error": "bad_request", "message": str(e)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self._route(method, target, body, reader, pending)
+                if payload is None:
+                    break
+                keep_alive = headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(
+        self, method: str, target: str, body: bytes, reader: asyncio.StreamReader, pending: bytearray
+    ) -> tuple[int, dict | str | None]:
+        """요청을 처리하고 (상태 코드, 응답)을 반환합니다. 분석을 기다리다 연결이 끊기면 응답은 None입니다."""
+        path = target.split("?", 1)[0]
+        if path == "/health":
+            return (200, self.stats()) if method == "GET" else (405, {"error": "method_not_allowed"})
+        if path == "/metrics":
+            return (200, get_stage_metrics().to_prometheus()) if method == "GET" else (405, {"error": "method_not_allowed"})
+        if path != "/analyze":
+            return 404, {"error": "not_found"}
+        if method != "POST":
+            return 405, {"error": "method_not_allowed"}
+
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            return 400, {"error": "bad_request", "message": f"JSON 파싱 실패: {e}"}
+        if not isinstance(request, dict) or not isinstance(request.get("path"), str) or not request["path"]:
+            return 400, {"error": "bad_request", "message": "path(이미지 경로) 필드가 필요합니다."}
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((request, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return 503, {"error": "queue_full", "message": "대기 중인 요청이 너무 많습니다."}
+        return 200, await _await_result(future, reader, pending)
+
+
+async def _await_result(future: asyncio.Future, reader: asyncio.StreamReader, pending: bytearray) -> dict | None:
+    """결과를 기다리면서 연결을 지켜보다가 클라이언트가 연결을 끊으면(EOF) 요청을 취소하고 None을 반환합니다.
+
+    기다리는 동안 클라이언트가 다음 요청을 보내기 시작하면(pipelining) 읽은 바이트를 pending에 넣고
+    더 이상 지켜보지 않습니다. 처리가 이미 시작된 요청은 끝까지 진행되고 결과만 버려집니다.
+    """
+    watch = asyncio.ensure_future(reader.read(1))
+    try:
+        await asyncio.wait((future, watch), return_when=asyncio.FIRST_COMPLETED)
+        if not future.done():
+            try:
+                data = watch.result()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                data = b""
+            if not data:
+                future.cancel()
+                return None
+            pending.extend(data)
+            return await future
+    finally:
+        if not watch.done():
+            watch.cancel()
+            try:
+                await watch
+            except asyncio.CancelledError:
+                pass
+    if not watch.cancelled() and watch.exception() is None:
+        pending.extend(watch.result())
+    return future.result()
+
+
+async def _read_request(
+    reader: asyncio.StreamReader, pending: bytearray
+) -> tuple[str, str, dict[str, str], bytes] | None:
+    """요청 줄, 헤더, Content-Length 만큼의 본문을 읽습니다. 연결이 닫혔으면 None.
+
+    pending은 이전 요청의 결과를 기다리는 동안 미리 읽은 이 요청의 첫 바이트입니다.
+    """
+    line = bytes(pending)
+    pending.clear()
+    if not line.endswith(b"\n"):
+        line += await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise _BadRequest(400, "잘못된 요청 줄입니다.") from None
+
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise _BadRequest(400, "잘못된 Content-Length입니다.") from None
+    if length > MAX_BODY_BYTES:
+        raise _BadRequest(413, f"요청 본문은 {MAX_BODY_BYTES} 바이트 이하여야 합니다.")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method.upper(), target, headers, body
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, payload: dict | str, keep_alive: bool) -> None:
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+        content_type = "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        content_type = "application/json; charset=utf-8"
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
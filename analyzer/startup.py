@@ -0,0 +1,135 @@
+import asyncio
+import importlib
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+# 무거운 의존성을 의존 순서대로 나열. 앞 모듈이 이미 로드된 뒤 측정하므로 각 항목은 그 모듈이 추가로 드는 시간
+PRELOAD_MODULES = (
+    "numpy",
+    "PIL.Image",
+    "usearch.index",
+    "google.genai",
+    "google.adk.runners",
+    "analyzer.tools",
+    "analyzer.search",
+    "analyzer.agent",
+)
+
+# 이 모듈이 import된 시각. main.py가 가장 먼저 import하므로 CLI 모듈 로드 시간의 기준으로 사용
+IMPORTED_AT = time.perf_counter()
+
+
+class StartupProfile:
+    """시작 과정의 단계별 소요 시간을 (스레드, 단계) 단위로 모읍니다 (--profile-startup)."""
+
+    def __init__(self):
+        self.started = IMPORTED_AT
+        self._rows: list[tuple[str, str, float, float]] = []
+        self._marked: set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, where: str, name: str, started: float, duration_ms: float) -> None:
+        with self._lock:
+            self._rows.append((where, name, (started - self.started) * 1000, duration_ms))
+
+    @contextmanager
+    def measure(self, where: str, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(where, name, started, (time.perf_counter() - started) * 1000)
+
+    def mark(self, name: str) -> None:
+        """시작 시점부터 지금까지 걸린 시간을 main 스레드의 이정표로 기록합니다. 같은 이름은 처음 한 번만 기록합니다."""
+        now = time.perf_counter()
+        with self._lock:
+            if name in self._marked:
+                return
+            self._marked.add(name)
+        self.add("main", name, self.started, (now - self.started) * 1000)
+
+    def report(self) -> str:
+        """시작 시각 순으로 정렬한 표 (시작 오프셋, 소요 시간 ms)."""
+        with self._lock:
+            rows = sorted(self._rows, key=lambda row: (row[2], row[0]))
+        lines = [f"  {'스레드':<8} {'단계':<34} {'시작':>9} {'소요':>9}"]
+        for where, name, offset_ms, duration_ms in rows:
+            lines.append(f"  {where:<8} {name:<34} {offset_ms:>9.1f} {duration_ms:>9.1f}")
+        return "\n".join(lines)
+
+
+class Preloader:
+    """무거운 모듈 import와 인덱스/클라이언트 초기화를 백그라운드 스레드에서 순서대로 실행합니다.
+
+    메인 스레드가 디렉토리를 탐색하거나 결과 캐시를 확인하는 동안 진행되며, 에이전트가 필요한 시점에
+    wait()로 완료를 기다립니다. 단계가 실패해도 멈추지 않고 다음 단계로 넘어가며, 실패한 초기화는
+    실제로 사용할 때 평소처럼 다시 시도되어 그 자리에서 오류가 납니다.
+    """
+
+    def __init__(self, steps: list[tuple[str, Callable[[], object]]], profile: StartupProfile | None = None):
+        self.steps = steps
+        self.profile = profile or get_startup_profile()
+        self.errors: dict[str, Exception] = {}
+        self._waited = False
+        self._done: Future = Future()
+        self._thread = threading.Thread(target=self._run, name="preload", daemon=True)
+
+    def start(self) -> "Preloader":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        for name, step in self.steps:
+            try:
+                with self.profile.measure("preload", name):
+                    step()
+            except Exception as e:
+                self.errors[name] = e
+        self._done.set_result(None)
+
+    def done(self) -> bool:
+        return self._done.done()
+
+    async def wait(self) -> None:
+        """이벤트 루프를 막지 않고 모든 단계가 끝날 때까지 기다립니다. 처음 기다린 시간을 프로파일에 기록합니다."""
+        if self._done.done():
+            return
+        started = time.perf_counter()
+        await asyncio.wrap_future(self._done)
+        if not self._waited:
+            self._waited = True
+            self.profile.add("main", "preload 대기", started, (time.perf_counter() - started) * 1000)
+
+
+def import_steps(modules: tuple[str, ...] = PRELOAD_MODULES) -> list[tuple[str, Callable[[], object]]]:
+    """모듈마다 import 단계를 만듭니다."""
+    return [(f"import {name}", lambda name=name: importlib.import_module(name)) for name in modules]
+
+
+_profile: StartupProfile | None = None
+_preloader: Preloader | None = None
+
+
+def get_startup_profile() -> StartupProfile:
+    """프로세스 전역 StartupProfile을 반환합니다 (싱글턴)."""
+    global _profile
+    if _profile is None:
+        _profile = StartupProfile()
+    return _profile
+
+
+def start_preload(steps: list[tuple[str, Callable[[], object]]]) -> Preloader:
+    """프로세스 전역 Preloader를 만들어 시작합니다."""
+    global _preloader
+    _preloader = Preloader(steps).start()
+    return _preloader
+
+
+async def wait_preload() -> None:
+    """백그라운드 초기화를 시작했다면 끝날 때까지 기다립니다."""
+    if _preloader is not None:
+        await _preloader.wait()
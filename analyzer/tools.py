@@ -1,48 +1,74 @@
+import base64
 import json
+import mmap
 import os
+import threading
 import uuid
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator, NamedTuple
 
 import numpy as np
-from google import genai
-from google.genai import types
 from usearch.index import Index
 
+from .cache import EmbeddingCache, make_embedding_key
+from .embedding import EMBEDDING_DIM, EMBEDDING_MODEL, get_embedding_service
+from .journal import Journal
+from .tracing import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 lock 없이 단일 프로세스로만 안전
+    fcntl = None
+
 VECTORDB_DIR = Path(__file__).resolve().parent.parent / "datasets" / "vectordb"
 INDEX_PATH = VECTORDB_DIR / "products.usearch"
 META_PATH = VECTORDB_DIR / "products_meta.json"
 SAVE_LOG_PATH = VECTORDB_DIR / "save_events.jsonl"
+JOURNAL_PATH = VECTORDB_DIR / "products.journal"
+# 읽기 전용 워커가 필요한 항목만 읽을 수 있도록 스냅샷과 함께 저장하는 메타데이터 (한 줄에 한 상품 + 키별 오프셋)
+META_LINES_PATH = VECTORDB_DIR / "products_meta.jsonl"
+META_OFFSETS_PATH = VECTORDB_DIR / "products_meta.offsets.npy"
+# 같은 DB를 쓰는 프로세스들이 저널 기록/압축을 직렬화하는 lock 파일과, 스냅샷을 교체할 때마다 올리는 세대 번호
+LOCK_PATH = VECTORDB_DIR / "products.lock"
+GENERATION_PATH = VECTORDB_DIR / "products.generation"
 JSON_DB_PATH = Path(__file__).resolve().parent.parent / "datasets" / "products_db.json"
 
-EMBEDDING_MODEL = "gemini-embedding-001"
-EMBEDDING_DIM = 768
+_embedding_cache: EmbeddingCache | None = None
 
-MAX_RETRIES = 2
-RETRY_DELAY = 3  # seconds
 
+def _get_embedding_cache() -> EmbeddingCache:
+    """디스크 임베딩 캐시를 반환합니다 (싱글턴)."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
 
-def _get_embedding(texts: list[str]) -> list[list[float]]:
-    """Gemini embedding API를 호출하여 텍스트 임베딩을 반환합니다. 실패 시 최대 2회 재시도합니다."""
-    import time as _time
 
-    client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
-    last_error = None
-    for attempt in range(1, MAX_RETRIES + 2):
-        try:
-            result = client.models.embed_content(
-                model=EMBEDDING_MODEL,
-                contents=texts,
-                config=types.EmbedContentConfig(output_dimensionality=EMBEDDING_DIM),
-            )
-            return [e.values for e in result.embeddings]
-        except Exception as e:
-            last_error = e
-            if attempt <= MAX_RETRIES:
-                print(f"  !! Embedding API 오류 (시도 {attempt}/{MAX_RETRIES + 1}): {e}", flush=True)
-                _time.sleep(RETRY_DELAY)
-            else:
-                raise last_error
+def _get_embedding(texts: list[str]) -> np.ndarray:
+    """텍스트 임베딩을 (len(texts), EMBEDDING_DIM) float32 배열로 반환합니다.
+
+    디스크 캐시에 있는 텍스트는 API를 호출하지 않고, 나머지는 EmbeddingService에 넘겨
+    다른 동시 호출과 함께 묶어서 요청합니다.
+    """
+    cache = _get_embedding_cache()
+    keys = [make_embedding_key(EMBEDDING_MODEL, EMBEDDING_DIM, text) for text in texts]
+    found = cache.get_many(keys)
+
+    missing: dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    if missing:
+        with span("embedding"):
+            vectors = get_embedding_service().embed(list(missing.values()))
+        fetched = {key: np.asarray(vec, dtype=np.float32) for key, vec in zip(missing, vectors)}
+        cache.put_many(fetched)
+        found.update(fetched)
+
+    return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
 
 
 # --- 메타데이터 관리 ---
@@ -56,9 +82,120 @@ def _load_meta() -> dict:
 
 
 def _save_meta(meta: dict) -> None:
-    """메타데이터 JSON을 저장합니다."""
+    """메타데이터 JSON을 임시 파일에 쓴 뒤 원자적으로 교체합니다."""
     META_PATH.parent.mkdir(parents=True, exist_ok=True)
-    META_PATH.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_path = META_PATH.with_name(META_PATH.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as fp:
+        fp.write(json.dumps(meta, ensure_ascii=False))
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_path, META_PATH)
+
+
+def _save_meta_lines(meta: dict) -> None:
+    """메타데이터를 JSONL + 키별 바이트 오프셋 배열로 저장합니다 (읽기 전용 모드용)."""
+    lines_tmp = META_LINES_PATH.with_name(META_LINES_PATH.name + ".tmp")
+    offsets = np.full(meta["next_key"], -1, dtype=np.int64)
+    with lines_tmp.open("wb") as fp:
+        for key, entry in meta["products"].items():
+            offsets[int(key)] = fp.tell()
+            fp.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+        fp.flush()
+        os.fsync(fp.fileno())
+    offsets_tmp = META_OFFSETS_PATH.with_name("tmp." + META_OFFSETS_PATH.name)
+    np.save(offsets_tmp, offsets)
+    os.replace(lines_tmp, META_LINES_PATH)
+    os.replace(offsets_tmp, META_OFFSETS_PATH)
+
+
+class _LazyProducts:
+    """products_meta.jsonl을 메모리 매핑하여 요청된 키의 항목만 파싱하는 매핑.
+
+    파일 내용은 OS 페이지 캐시에 올라가므로 같은 호스트의 여러 워커 프로세스가 공유합니다.
+    스냅샷 이후 저널에서 읽은 추가/변경 항목은 메모리의 overlay에 두고 스냅샷보다 먼저 찾습니다.
+    """
+
+    def __init__(self, lines_path: Path, offsets_path: Path):
+        self._fp = lines_path.open("rb")
+        size = os.fstat(self._fp.fileno()).st_size
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._offsets = np.load(offsets_path, mmap_mode="r")
+        self._count = int((self._offsets >= 0).sum())
+        self.overlay: dict[str, dict] = {}
+
+    @property
+    def next_key(self) -> int:
+        """스냅샷을 저장할 때의 next_key (오프셋 배열 길이)."""
+        return len(self._offsets)
+
+    def __len__(self) -> int:
+        return self._count + sum(1 for key in self.overlay if self._offset(key) < 0)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.overlay or self._offset(key) >= 0
+
+    def __setitem__(self, key: str, entry: dict) -> None:
+        self.overlay[key] = entry
+
+    def _offset(self, key: str) -> int:
+        try:
+            i = int(key)
+        except ValueError:
+            return -1
+        return int(self._offsets[i]) if 0 <= i < len(self._offsets) else -1
+
+    def get(self, key: str, default=None):
+        if key in self.overlay:
+            return self.overlay[key]
+        offset = self._offset(key)
+        if offset < 0:
+            return default
+        end = self._mm.find(b"\n", offset)
+        return json.loads(self._mm[offset:end if end >= 0 else len(self._mm)])
+
+
+class _Matches(NamedTuple):
+    keys: np.ndarray
+    distances: np.ndarray
+
+
+class _OverlayIndex:
+    """메모리 매핑한 스냅샷 인덱스(view, 수정 불가) 위에 저널에서 읽은 새 벡터를 담는 작은 인덱스를 얹은 읽기 전용 인덱스.
+
+    검색은 두 인덱스의 결과를 거리순으로 합칩니다. 쓰기 프로세스가 압축하면 세대 번호가 바뀌어 스냅샷부터 다시 엽니다.
+    """
+
+    def __init__(self, base: Index):
+        self.base = base
+        self.overlay = _new_index(_dtype_name(base.dtype), like=base)
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.overlay)
+
+    @property
+    def keys(self) -> np.ndarray:
+        return np.concatenate([np.asarray(self.base.keys, dtype=np.uint64), np.asarray(self.overlay.keys, dtype=np.uint64)])
+
+    def contains(self, key: int) -> bool:
+        return self.base.contains(key) or self.overlay.contains(key)
+
+    def add(self, key: int, vector: np.ndarray) -> None:
+        self.overlay.add(key, vector)
+
+    def get(self, keys: np.ndarray, dtype=np.float32) -> np.ndarray:
+        return np.stack([
+            np.asarray((self.overlay if self.overlay.contains(int(key)) else self.base).get(int(key), dtype=dtype)).reshape(-1)
+            for key in keys
+        ])
+
+    def search(self, vector: np.ndarray, count: int):
+        if len(self.overlay) == 0:
+            return self.base.search(vector, count)
+        results = [self.base.search(vector, count), self.overlay.search(vector, min(count, len(self.overlay)))]
+        keys = np.concatenate([np.asarray(r.keys, dtype=np.uint64) for r in results])
+        distances = np.concatenate([np.asarray(r.distances, dtype=np.float32) for r in results])
+        order = np.argsort(distances, kind="stable")[:count]
+        return _Matches(keys[order], distances[order])
 
 
 def _normalize_text(value: str) -> str:
@@ -101,36 +238,518 @@ def _append_save_log(event: dict) -> None:
 
 _index: Index | None = None
 _meta: dict | None = None
+# 정규화된 (상품명, 브랜드, 국가, 언어) → 메타데이터 키. 저장 시 전체 스캔 없이 중복을 찾기 위한 보조 인덱스
+_dedup_index: dict[tuple[str, str, str, str], str] = {}
+# 정규화된 (국가, 언어, 카테고리) → 상품 수. 필터 검색에서 후보를 얼마나 더 가져와야 하는지 추정하는 데 사용
+_partition_sizes: Counter[tuple[str, str, str]] = Counter()
+
+# 새로 만드는 인덱스의 벡터 저장 형식 (f32 / f16 / i8). 기존 인덱스는 파일에 기록된 형식을 그대로 사용하며,
+# 형식 변환은 `python -m analyzer.quantize`로 수행
+INDEX_DTYPE = os.environ.get("WHATIS_VECTORDB_DTYPE", "f32")
+# HNSW 그래프 파라미터. connectivity/expansion_add는 새 인덱스를 만들 때만, expansion_search는 로드할 때도 적용됨
+# (값 선택은 `python -m analyzer.benchmark`의 파라미터 스윕 결과 참고)
+INDEX_CONNECTIVITY = int(os.environ.get("WHATIS_VECTORDB_CONNECTIVITY", "16"))
+INDEX_EXPANSION_ADD = int(os.environ.get("WHATIS_VECTORDB_EXPANSION_ADD", "128"))
+INDEX_EXPANSION_SEARCH = int(os.environ.get("WHATIS_VECTORDB_EXPANSION_SEARCH", "64"))
+
+# True이면 스냅샷 인덱스를 메모리 매핑(view)하고 메타데이터를 필요할 때만 읽으며, 저장은 하지 않음
+READ_ONLY = os.environ.get("WHATIS_VECTORDB_READONLY", "").lower() in ("1", "true", "yes")
+
+# search_local_db 기본/최대 결과 수와 결과에 포함할 최소 유사도
+DEFAULT_TOP_K = 3
+MAX_TOP_K = 50
+MIN_SCORE = 0.3
+# 필터 검색 시 파티션 비율로 추정한 후보 수에 곱하는 여유분
+SEARCH_OVERSAMPLE = 2.0
+# 후보가 부족할 때 후보 수를 4배씩 늘려 다시 검색하는 최대 횟수. 넘으면 그때까지 모은 결과만 반환
+SEARCH_MAX_EXPANSIONS = 2
+
+# 저널 레코드가 이 수를 넘으면 전체 스냅샷으로 압축하고 저널을 비움
+COMPACT_THRESHOLD = 5000
+_journal: Journal | None = None
+# 0보다 크면 저널 크기에 따른 자동 압축을 하지 않음. 대량 적재 중에는 호출자의 checkpoint()로만 스냅샷을 남김
+_compaction_suspended = 0
+# add_products_bulk로 추가했지만 아직 스냅샷에 저장되지 않은 키. 저널에는 벡터 없이 키 예약만 기록하므로
+# 다른 프로세스가 스냅샷을 교체해 다시 로드할 때 이 상품들을 메모리의 인덱스에서 옮겨 담음
+_unsaved_bulk: set[int] = set()
+
+# 0보다 크면 이름이 조금 달라도 같은 브랜드/국가/언어이고 임베딩 유사도가 이 값 이상인 상품을 중복으로 병합
+SEMANTIC_DEDUP_THRESHOLD = 0.0
+# 도구가 스레드 풀에서 동시에 호출되므로 인덱스/메타데이터 접근을 보호
+_lock = threading.RLock()
+
+
+class _SearchGate:
+    """_lock 밖에서 동시에 실행되는 검색과 인덱스에 벡터를 추가하는 작업(_lock 안)을 분리합니다.
+
+    usearch의 add는 용량이 부족하면 노드 배열을 다시 할당하므로 진행 중인 검색이 없을 때만 실행합니다.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        with self._cond:
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+_search_gate = _SearchGate()
+
+
+class _FileLock:
+    """같은 DB를 쓰는 프로세스 사이의 flock.
+
+    프로세스 안에서는 항상 _lock을 잡은 스레드만 사용하므로 중첩 호출은 깊이만 세고, 가장 바깥
+    호출이 잡은 모드(공유/배타)를 유지합니다. lock 파일을 열 수 없으면(읽기 전용 파일 시스템 등)
+    lock 없이 동작합니다.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+        self._depth = 0
+        self._disabled = fcntl is None
+
+    def _open(self) -> int | None:
+        if self._fd is None and not self._disabled:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError:
+                self._disabled = True
+        return self._fd
+
+    @contextmanager
+    def hold(self, exclusive: bool) -> Iterator[None]:
+        if self._depth == 0:
+            fd = self._open()
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0 and self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+_file_lock = _FileLock(LOCK_PATH)
+# 이 프로세스가 로드한 스냅샷의 세대 번호. 디스크 값과 다르면 다른 프로세스가 스냅샷을 교체한 것
+_generation = 0
+
+
+def _read_generation() -> int:
+    try:
+        return int(GENERATION_PATH.read_text(encoding="utf-8") or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _bump_generation() -> None:
+    """스냅샷 파일을 교체한 뒤 세대 번호를 올려 다른 프로세스가 다시 로드하게 합니다. 배타 파일 lock이 필요합니다."""
+    global _generation
+    _generation = _read_generation() + 1
+    tmp_path = GENERATION_PATH.with_name(GENERATION_PATH.name + ".tmp")
+    tmp_path.write_text(str(_generation), encoding="utf-8")
+    os.replace(tmp_path, GENERATION_PATH)
+
+
+def _dedup_key(product_name: str, brand: str, country: str, lang: str) -> tuple[str, str, str, str]:
+    """중복 판정용 키: 각 필드를 정규화 후 casefold 합니다."""
+    return (
+        _normalize_text(product_name).casefold(),
+        _normalize_text(brand).casefold(),
+        _normalize_text(country).casefold(),
+        _normalize_text(lang).casefold(),
+    )
+
+
+def _register_dedup(key: str, entry: dict) -> None:
+    """메타데이터 항목을 중복 판정 인덱스에 등록합니다. 같은 키가 여러 개면 먼저 저장된 항목을 유지합니다."""
+    dedup = _dedup_key(entry.get("product_name", ""), entry.get("brand", ""), entry.get("country", ""), entry.get("lang", ""))
+    _dedup_index.setdefault(dedup, key)
+
+
+def _register_entry(key: str, entry: dict) -> None:
+    """새로 로드/추가된 상품을 중복 판정 인덱스와 파티션 통계에 등록합니다."""
+    _register_dedup(key, entry)
+    country = _normalize_text(entry.get("country", "")).casefold()
+    lang = _normalize_text(entry.get("lang", "")).casefold()
+    category = _normalize_text(entry.get("category", "")).casefold()
+    _partition_sizes[(country, lang, category)] += 1
+
+
+def _new_index(dtype: str | None = None, like: Index | None = None) -> Index:
+    """빈 USearch 인덱스를 만듭니다.
+
+    like를 주면 그 인덱스의 그래프 파라미터(connectivity, expansion)를 그대로 따르고, 없으면 현재 설정을 씁니다.
+    """
+    return Index(
+        ndim=EMBEDDING_DIM,
+        metric="cos",
+        dtype=dtype or INDEX_DTYPE,
+        connectivity=like.connectivity if like is not None else INDEX_CONNECTIVITY,
+        expansion_add=like.expansion_add if like is not None else INDEX_EXPANSION_ADD,
+        expansion_search=like.expansion_search if like is not None else INDEX_EXPANSION_SEARCH,
+    )
+
+
+def _restore_index(view: bool = False) -> Index | None:
+    """디스크 스냅샷을 복원하고 검색 파라미터를 현재 설정으로 맞춥니다."""
+    index = Index.restore(str(INDEX_PATH), view=view)
+    if index is not None:
+        index.expansion_search = INDEX_EXPANSION_SEARCH
+    return index
+
+
+def configure_storage(directory: Path) -> None:
+    """Vector DB 파일 위치를 바꾸고 로드된 인덱스/메타데이터를 초기화합니다.
+
+    벤치마크나 별도 DB로 작업할 때 사용합니다. 임베딩 캐시도 새 위치에 두며, 다음 도구 호출 시
+    새 위치에서 다시 로드합니다.
+    """
+    global VECTORDB_DIR, INDEX_PATH, META_PATH, SAVE_LOG_PATH, JOURNAL_PATH, META_LINES_PATH, META_OFFSETS_PATH, JSON_DB_PATH
+    global LOCK_PATH, GENERATION_PATH
+    global _index, _meta, _journal, _embedding_cache, _file_lock, _generation
+    with _lock:
+        if _journal is not None:
+            _journal.close()
+        _file_lock.close()
+        VECTORDB_DIR = Path(directory)
+        INDEX_PATH = VECTORDB_DIR / "products.usearch"
+        META_PATH = VECTORDB_DIR / "products_meta.json"
+        SAVE_LOG_PATH = VECTORDB_DIR / "save_events.jsonl"
+        JOURNAL_PATH = VECTORDB_DIR / "products.journal"
+        META_LINES_PATH = VECTORDB_DIR / "products_meta.jsonl"
+        META_OFFSETS_PATH = VECTORDB_DIR / "products_meta.offsets.npy"
+        LOCK_PATH = VECTORDB_DIR / "products.lock"
+        GENERATION_PATH = VECTORDB_DIR / "products.generation"
+        # 기본 DB의 JSON 데이터가 새 위치로 마이그레이션되지 않도록 새 위치 안의 경로로 바꿈
+        JSON_DB_PATH = VECTORDB_DIR / "products_db.json"
+        _embedding_cache = EmbeddingCache(VECTORDB_DIR / "embeddings.sqlite3")
+        _index = None
+        _meta = None
+        _journal = None
+        _file_lock = _FileLock(LOCK_PATH)
+        _generation = 0
+        _dedup_index.clear()
+        _partition_sizes.clear()
+        _unsaved_bulk.clear()
+
+
+def configure_read_only(enabled: bool) -> None:
+    """읽기 전용(메모리 매핑) 모드를 설정합니다. 인덱스를 처음 사용하기 전에 호출해야 합니다."""
+    global READ_ONLY
+    READ_ONLY = enabled
+
+
+def configure_semantic_dedup(threshold: float) -> None:
+    """임베딩 유사도 기반 중복 병합 임계값을 설정합니다. 0 이하이면 비활성화합니다."""
+    global SEMANTIC_DEDUP_THRESHOLD
+    SEMANTIC_DEDUP_THRESHOLD = threshold
+
+
+def warm_up() -> int:
+    """인덱스와 메타데이터를 미리 로드하고 상품 수를 반환합니다."""
+    index, _ = _get_index()
+    return len(index)
 
 
 def _get_index() -> tuple[Index, dict]:
-    """USearch 인덱스와 메타데이터를 반환합니다 (싱글턴)."""
-    global _index, _meta
-    if _index is not None and _meta is not None:
+    """USearch 인덱스와 메타데이터를 반환합니다 (싱글턴). 다른 프로세스의 변경이 있으면 먼저 반영합니다."""
+    with _lock:
+        if _index is None or _meta is None:
+            _open_index()
+        else:
+            _refresh()
         return _index, _meta
 
+
+@contextmanager
+def _write_lock() -> Iterator[tuple[Index, dict]]:
+    """스레드 lock과 프로세스 간 배타 lock을 잡고, 다른 프로세스의 변경까지 반영한 (인덱스, 메타데이터)를 넘겨줍니다.
+
+    키 할당(next_key)과 저널 기록은 이 블록 안에서 해야 여러 프로세스가 같은 키를 쓰거나
+    서로의 저장을 덮어쓰지 않습니다.
+    """
+    with _lock:
+        if _index is None or _meta is None:
+            _open_index()
+        with _file_lock.hold(exclusive=True):
+            _refresh()
+            yield _index, _meta
+
+
+def _open_index() -> None:
+    """처음 사용할 때 인덱스를 로드하고, 필요하면 JSON DB 마이그레이션과 압축을 합니다. _lock을 잡은 상태에서 호출합니다."""
+    with _file_lock.hold(exclusive=not READ_ONLY):
+        _load_index()
+        if READ_ONLY:
+            return
+        if not _meta["products"]:
+            # 인덱스가 비어 있으면 기존 JSON DB에서 마이그레이션
+            _migrate_json_db()
+        if len(_get_journal()) >= COMPACT_THRESHOLD:
+            _compact()
+
+
+def _refresh() -> None:
+    """다른 프로세스가 디스크에 남긴 변경을 반영합니다. _lock을 잡은 상태에서 호출합니다.
+
+    세대 번호가 바뀌었으면(다른 프로세스가 스냅샷을 압축/교체함) 스냅샷부터 다시 로드하고,
+    그렇지 않으면 저널에 새로 추가된 레코드만 재생합니다.
+    """
+    with _file_lock.hold(exclusive=False):
+        if _read_generation() != _generation:
+            unsaved = _collect_unsaved_bulk()
+            _load_index()
+            _restore_unsaved_bulk(*unsaved)
+        else:
+            _replay_journal(_get_journal().read_new())
+
+
+def _load_index() -> None:
+    """디스크에서 인덱스와 메타데이터를 로드하고 저널을 재생합니다. _lock과 파일 lock을 잡은 상태에서 호출합니다."""
+    global _index, _meta, _generation
+    _generation = _read_generation()
+    if READ_ONLY:
+        _load_index_view()
+        return
+
     VECTORDB_DIR.mkdir(parents=True, exist_ok=True)
 
-    _index = Index(ndim=EMBEDDING_DIM, metric="cos")
+    _index = _new_index()
     _meta = _load_meta()
 
     if INDEX_PATH.exists() and _meta["products"]:
-        _index.load(str(INDEX_PATH))
-    elif not _meta["products"]:
-        # 인덱스가 비어 있으면 기존 JSON DB에서 마이그레이션
-        _migrate_json_db()
+        # 파일 헤더의 dtype/차원으로 복원 (양자화된 인덱스도 그대로 로드)
+        _index = _restore_index() or _index
+
+    _dedup_index.clear()
+    _partition_sizes.clear()
+    for key in sorted(_meta["products"], key=int):
+        _register_entry(key, _meta["products"][key])
+
+    journal = _get_journal()
+    journal.rewind()
+    _replay_journal(journal.read_new())
+
 
-    return _index, _meta
+def _collect_unsaved_bulk() -> tuple[list[int], list[dict], np.ndarray]:
+    """스냅샷에 아직 저장되지 않은 대량 적재 상품의 (키, 항목, 벡터)를 현재 인덱스에서 꺼냅니다."""
+    keys = sorted(_unsaved_bulk)
+    if not keys or _index is None or _meta is None:
+        return [], [], np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    entries = [_meta["products"][str(key)] for key in keys]
+    vectors = np.asarray(_index.get(np.array(keys, dtype=np.uint64), dtype=np.float32), dtype=np.float32)
+    return keys, entries, vectors.reshape(len(keys), -1)
+
+
+def _restore_unsaved_bulk(keys: list[int], entries: list[dict], vectors: np.ndarray) -> None:
+    """다시 로드한 스냅샷에 없는 대량 적재 상품을 예약된 키 그대로 다시 추가합니다."""
+    rows = [i for i, key in enumerate(keys) if str(key) not in _meta["products"]]
+    if not rows:
+        return
+    with _search_gate.writing():
+        _index.add(np.array([keys[i] for i in rows], dtype=np.uint64), vectors[rows], threads=0)
+    for i in rows:
+        _meta["products"][str(keys[i])] = entries[i]
+        _register_entry(str(keys[i]), entries[i])
+        _meta["next_key"] = max(_meta["next_key"], keys[i] + 1)
+
+
+def _load_index_view() -> None:
+    """마지막 스냅샷을 읽기 전용으로 엽니다.
+
+    인덱스는 usearch view()로 메모리 매핑하고, 메타데이터는 JSONL을 메모리 매핑하여
+    검색 결과에 필요한 항목만 파싱합니다. 스냅샷 이후 쓰기 프로세스가 저널에 남긴 저장은
+    메모리의 overlay(_OverlayIndex, _LazyProducts.overlay)에 재생하고, 이후 _refresh()마다
+    새 레코드만 더 읽습니다.
+    """
+    global _index, _meta
+    _partition_sizes.clear()
+    if not INDEX_PATH.exists():
+        _index = _new_index()
+        _meta = {"products": {}, "next_key": 0}
+    else:
+        view = _restore_index(view=True)
+        _index = _OverlayIndex(view) if view is not None else _new_index()
+        if META_LINES_PATH.exists() and META_OFFSETS_PATH.exists():
+            products = _LazyProducts(META_LINES_PATH, META_OFFSETS_PATH)
+            _meta = {"products": products, "next_key": products.next_key}
+        else:
+            # 오프셋 파일이 없는 이전 형식의 DB는 전체 메타데이터를 파싱
+            _meta = _load_meta()
+
+    journal = _get_journal()
+    journal.rewind()
+    _replay_journal(journal.read_new())
+
+
+def _get_journal() -> Journal:
+    """메타데이터/벡터 변경 저널을 반환합니다 (싱글턴)."""
+    global _journal
+    if _journal is None:
+        _journal = Journal(JOURNAL_PATH, on_flush=_maybe_compact)
+    return _journal
+
+
+def _replay_journal(records: list[dict]) -> None:
+    """스냅샷 이후의(또는 다른 프로세스가 새로 기록한) 저널 레코드를 인덱스/메타데이터에 반영합니다.
+
+    압축 도중 중단되어 일부가 이미 스냅샷에 들어가 있어도 같은 결과가 되도록 멱등하게 적용합니다.
+    대량 적재의 키 예약 레코드(op="reserve")는 next_key만 옮깁니다.
+    """
+    for record in records:
+        key = int(record["key"])
+        if record["op"] == "add":
+            if str(key) not in _meta["products"]:
+                if not _index.contains(key):
+                    with _search_gate.writing():
+                        _index.add(key, _decode_vector(record["vector"]))
+                _meta["products"][str(key)] = record["entry"]
+                if not READ_ONLY:
+                    # 읽기 전용 모드는 스냅샷의 통계가 없으므로 저널 항목만으로 파티션 통계를 만들지 않음
+                    _register_entry(str(key), record["entry"])
+        elif record["op"] == "update":
+            _meta["products"][str(key)] = record["entry"]
+        _meta["next_key"] = max(_meta["next_key"], key + 1)
+
+
+def _encode_vector(vec: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vec, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+def _journal_add(key: int, entry: dict, vec: np.ndarray) -> None:
+    """새 상품 추가를 저널에 기록합니다. fsync는 group commit으로 모아서 수행됩니다. _write_lock 안에서 호출합니다."""
+    _get_journal().append({"op": "add", "key": key, "entry": entry, "vector": _encode_vector(vec)})
+
+
+def _journal_update(key: str, entry: dict) -> None:
+    """기존 상품 메타데이터 변경을 저널에 기록합니다."""
+    _get_journal().append({"op": "update", "key": int(key), "entry": entry})
+
+
+def _maybe_compact(journal: Journal) -> None:
+    """저널이 충분히 커졌으면 스냅샷으로 압축합니다 (group commit 스레드에서 호출)."""
+    if not _compaction_suspended and len(journal) >= COMPACT_THRESHOLD:
+        with _lock, _file_lock.hold(exclusive=True):
+            if journal is _journal:
+                _compact()
+
+
+def _compact() -> None:
+    """전체 스냅샷을 원자적으로 저장하고 세대 번호를 올린 뒤 저널을 비웁니다.
+
+    _lock과 배타 파일 lock을 잡은 상태에서 호출합니다. 다른 프로세스가 기록한 저널 레코드를 먼저
+    반영하므로 스냅샷에서 빠지는 저장이 없고, 세대 번호를 올린 뒤 비우므로 그 사이에 중단되어도
+    저널 재생이 멱등하여 결과가 같습니다.
+    """
+    _refresh()
+    journal = _get_journal()
+    journal.flush()
+    _persist()
+    _unsaved_bulk.clear()
+    _bump_generation()
+    journal.truncate()
 
 
 def _persist() -> None:
-    """인덱스와 메타데이터를 디스크에 저장합니다."""
+    """인덱스와 메타데이터 스냅샷을 임시 파일에 쓴 뒤 원자적으로 교체합니다."""
     if _index is not None:
-        _index.save(str(INDEX_PATH))
+        tmp_path = INDEX_PATH.with_name(INDEX_PATH.name + ".tmp")
+        _index.save(str(tmp_path))
+        os.replace(tmp_path, INDEX_PATH)
     if _meta is not None:
+        _save_meta_lines(_meta)
         _save_meta(_meta)
 
 
+def export_vectors() -> tuple[np.ndarray, np.ndarray]:
+    """인덱스의 모든 (키, float32 벡터)를 반환합니다. 저널에만 있는 변경도 포함됩니다."""
+    index, _ = _get_index()
+    with _lock:
+        keys = np.array(index.keys, dtype=np.uint64)
+        if len(keys) == 0:
+            return keys, np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        vectors = np.asarray(index.get(keys, dtype=np.float32), dtype=np.float32).reshape(len(keys), -1)
+    return keys, vectors
+
+
+def _dtype_name(kind) -> str:
+    """ScalarKind.F16과 "f16"처럼 형식이 다른 dtype 표기를 "f16"으로 통일합니다."""
+    return str(getattr(kind, "name", kind)).split(".")[-1].lower()
+
+
+def convert_index_dtype(dtype: str) -> dict:
+    """기존 인덱스를 지정한 벡터 형식(f32/f16/i8)으로 변환하여 원자적으로 교체합니다.
+
+    변환 전 저널을 스냅샷에 반영하고, 원본은 products.usearch.bak으로 남깁니다. 교체 후 세대 번호를
+    올리므로 같은 DB를 쓰는 다른 프로세스도 변환된 인덱스를 다시 로드합니다.
+    """
+    global _index
+    if READ_ONLY:
+        raise RuntimeError("읽기 전용 모드에서는 인덱스를 변환할 수 없습니다.")
+    with _write_lock():
+        _compact()
+        source_dtype = _dtype_name(_index.dtype)
+        keys, vectors = export_vectors()
+        # 벡터 형식만 바꾸고 그래프 파라미터는 원본 인덱스의 것을 유지
+        converted = _new_index(dtype, like=_index)
+        if len(keys):
+            converted.add(keys, vectors, threads=0)
+
+        if INDEX_PATH.exists():
+            backup_path = INDEX_PATH.with_name(INDEX_PATH.name + ".bak")
+            backup_path.write_bytes(INDEX_PATH.read_bytes())
+        tmp_path = INDEX_PATH.with_name(INDEX_PATH.name + ".tmp")
+        converted.save(str(tmp_path))
+        os.replace(tmp_path, INDEX_PATH)
+        _index = converted
+        _bump_generation()
+    return {
+        "from": source_dtype,
+        "to": _dtype_name(converted.dtype),
+        "vectors": int(len(keys)),
+        "bytes": INDEX_PATH.stat().st_size,
+    }
+
+
 def _migrate_json_db() -> None:
     """기존 JSON DB 데이터를 USearch Vector DB로 마이그레이션합니다."""
     if not JSON_DB_PATH.exists():
@@ -169,24 +788,146 @@ def _migrate_json_db() -> None:
     if not texts:
         return
 
-    embeddings = _get_embedding(texts)
-    vectors = np.array(embeddings, dtype=np.float32)
+    vectors = _get_embedding(texts)
 
+    start = _meta["next_key"]
+    with _search_gate.writing():
+        _index.add(np.arange(start, start + len(entries), dtype=np.uint64), vectors, threads=0)
     for i, entry in enumerate(entries):
-        key = _meta["next_key"]
-        _meta["next_key"] = key + 1
-        _index.add(key, vectors[i])
-        _meta["products"][str(key)] = entry
+        _meta["products"][str(start + i)] = entry
+        _register_entry(str(start + i), entry)
+    _meta["next_key"] = start + len(entries)
 
-    _persist()
+    _compact()
     print(f"  [마이그레이션] JSON DB → Vector DB: {len(entries)}개 상품 이전 완료")
 
 
-def search_local_db(key_features: list[str]) -> str:
+def normalize_product(record: dict) -> dict | None:
+    """카탈로그 레코드를 저장용 메타데이터 항목으로 정규화합니다. 필수 필드가 비어 있으면 None을 반환합니다."""
+    entry = {
+        "id": _normalize_text(str(record.get("id") or "")) or str(uuid.uuid4()),
+        "product_name": _normalize_text(record.get("product_name", "")),
+        "brand": _normalize_text(record.get("brand", "")),
+        "category": _normalize_text(record.get("category", "")),
+        "key_features": _normalize_features(record.get("key_features", [])),
+        "source": _normalize_text(record.get("source", "")) or "catalog",
+        "country": _normalize_text(record.get("country", "")) or "KR",
+        "lang": _normalize_text(record.get("lang", "")) or "ko",
+        "created_at": _normalize_text(record.get("created_at", "")) or datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if not (entry["product_name"] and entry["brand"] and entry["category"] and entry["key_features"]):
+        return None
+    return entry
+
+
+def is_known_product(entry: dict) -> bool:
+    """동일 상품명+브랜드+국가+언어 항목이 이미 DB에 있는지 확인합니다."""
+    _, meta = _get_index()
+    with _lock:
+        return _find_duplicate(meta, entry["product_name"], entry["brand"], entry["country"], entry["lang"]) is not None
+
+
+def add_products_bulk(entries: list[dict], vectors: np.ndarray) -> list[int | None]:
+    """정규화된 항목과 벡터를 한 번의 멀티스레드 index.add로 추가하고 항목별 키를 반환합니다 (대량 적재용).
+
+    이미 있거나 같은 배치 안에서 반복된 상품은 건너뛰고 None을 돌려줍니다. 저널에는 벡터 없이 사용한 키만
+    예약하여 같은 DB를 쓰는 다른 프로세스와 키가 겹치지 않게 하고, 상품은 호출자가 주기적으로 호출하는
+    checkpoint()의 스냅샷에 저장됩니다 (그 전에 중단되면 마지막 체크포인트부터 다시 적재). 다른 프로세스는
+    checkpoint() 후 추가된 상품을 봅니다.
+    """
+    if READ_ONLY:
+        raise RuntimeError("읽기 전용 모드에서는 상품을 추가할 수 없습니다.")
+    with _write_lock() as (index, meta):
+        keys: list[int | None] = []
+        rows: list[int] = []
+        seen: set[tuple[str, str, str, str]] = set()
+        for i, entry in enumerate(entries):
+            dedup = _dedup_key(entry["product_name"], entry["brand"], entry["country"], entry["lang"])
+            if dedup in seen or _find_duplicate(meta, *dedup) is not None:
+                keys.append(None)
+                continue
+            seen.add(dedup)
+            keys.append(meta["next_key"] + len(rows))
+            rows.append(i)
+
+        if rows:
+            new_keys = np.array([keys[i] for i in rows], dtype=np.uint64)
+            with _search_gate.writing():
+                index.add(new_keys, np.asarray(vectors, dtype=np.float32)[rows], threads=0)
+            for i in rows:
+                meta["products"][str(keys[i])] = entries[i]
+                _register_entry(str(keys[i]), entries[i])
+            meta["next_key"] += len(rows)
+            _unsaved_bulk.update(keys[i] for i in rows)
+            _get_journal().append({"op": "reserve", "key": keys[rows[-1]]})
+    return keys
+
+
+def checkpoint() -> None:
+    """현재 인덱스와 메타데이터를 스냅샷으로 저장하고 저널을 비웁니다."""
+    with _write_lock():
+        _compact()
+
+
+@contextmanager
+def suspend_compaction() -> Iterator[None]:
+    """블록 안에서는 저널 크기에 따른 자동 압축을 하지 않습니다 (대량 적재용, 스냅샷은 checkpoint()로 저장)."""
+    global _compaction_suspended
+    with _lock:
+        _compaction_suspended += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _compaction_suspended -= 1
+
+
+def _candidate_count(k: int, size: int, country: str, lang: str, category: str) -> int:
+    """필터 검색에서 처음 가져올 후보 수를 파티션 크기로 추정합니다. _lock을 잡은 상태에서 호출합니다.
+
+    국가/언어/카테고리 조건에 맞는 상품이 전체의 1/n이면 k × n × SEARCH_OVERSAMPLE개를 가져와 대부분 한 번에
+    k개를 채웁니다. 파티션 통계가 없는 경우(읽기 전용 모드)에는 k × SEARCH_OVERSAMPLE부터 시작합니다.
+    조건에 맞는 상품이 없다고 확실하면 0을 반환합니다.
+    """
+    if not (country or lang or category):
+        return min(k, size)
+    partition = sum(
+        n for (c, l, g), n in _partition_sizes.items()
+        if (not country or c == country) and (not lang or l == lang) and (not category or g == category)
+    )
+    if _partition_sizes and not partition:
+        # 통계가 있는데 해당 파티션이 비어 있으면 검색할 필요가 없음
+        return 0
+    ratio = size / partition if partition else 1.0
+    return min(size, max(k, int(k * ratio * SEARCH_OVERSAMPLE)))
+
+
+def _matches_filter(entry: dict, country: str, lang: str, category: str) -> bool:
+    """메타데이터 항목이 (정규화된) 국가/언어/카테고리 조건을 모두 만족하는지 확인합니다. 빈 조건은 무시합니다."""
+    return all(
+        not expected or _normalize_text(entry.get(field, "")).casefold() == expected
+        for field, expected in (("country", country), ("lang", lang), ("category", category))
+    )
+
+
+def search_local_db(
+    key_features: list[str],
+    country: str = "",
+    lang: str = "",
+    category: str = "",
+    top_k: int = DEFAULT_TOP_K,
+) -> str:
     """key_features를 사용하여 로컬 Vector DB에서 유사 상품을 검색합니다.
 
+    country/lang/category를 지정하면 해당 조건에 맞는 상품만 반환합니다. 조건에 맞는 후보가
+    top_k개 모일 때까지(또는 유사도가 기준 아래로 떨어질 때까지) 가져올 후보 수를 늘려 다시 검색합니다.
+
     Args:
         key_features: 검색할 키워드 리스트
+        country: 국가 코드 필터 (예: KR). 빈 문자열이면 필터하지 않음
+        lang: 언어 코드 필터 (예: ko). 빈 문자열이면 필터하지 않음
+        category: 카테고리 필터 (영문). 빈 문자열이면 필터하지 않음
+        top_k: 반환할 최대 결과 수
 
     Returns:
         매칭된 상품 정보 JSON 문자열 또는 결과 없음 메시지
@@ -198,38 +939,160 @@ def search_local_db(key_features: list[str]) -> str:
     if len(index) == 0 or not normalized_features:
         return json.dumps({"found": False, "message": "로컬 DB에 상품이 없습니다."}, ensure_ascii=False)
 
-    query_text = " ".join(normalized_features)
-    query_vec = np.array(_get_embedding([query_text])[0], dtype=np.float32)
+    country = _normalize_text(country).casefold()
+    lang = _normalize_text(lang).casefold()
+    category = _normalize_text(category).casefold()
+    filtered = bool(country or lang or category)
+    top_k = max(1, min(int(top_k), MAX_TOP_K))
 
-    n_results = min(3, len(index))
-    results = index.search(query_vec, n_results)
+    query_text = " ".join(normalized_features)
+    query_vec = _get_embedding([query_text])[0]
 
     matched = []
-    for i in range(len(results.keys)):
-        key = str(int(results.keys[i]))
-        distance = float(results.distances[i])
-        # USearch cosine metric: distance = 1 - similarity
-        score = round(1.0 - distance, 2)
+    with span("vectordb.search"):
+        # 통계만 lock 안에서 읽고 검색은 lock 밖에서 수행 (usearch 검색은 동시에 실행 가능, 인덱스 교체 시에도
+        # 이미 받은 인덱스/메타데이터 참조로 끝까지 검색)
+        with _lock:
+            size = len(index)
+            n_results = _candidate_count(top_k, size, country, lang, category)
+        seen: set[int] = set()
+        expansions = 0
+        while n_results > 0:
+            with _search_gate.reading():
+                results = index.search(query_vec, n_results)
+            exhausted = False
+            for i in range(len(results.keys)):
+                raw_key = int(results.keys[i])
+                # USearch cosine metric: distance = 1 - similarity
+                score = round(1.0 - float(results.distances[i]), 2)
+                if score < MIN_SCORE:
+                    # 결과는 유사도 내림차순이므로 이후 후보도 모두 기준 미만
+                    exhausted = True
+                    break
+                if raw_key in seen:
+                    continue
+                seen.add(raw_key)
+
+                entry = meta["products"].get(str(raw_key))
+                if not entry or not _matches_filter(entry, country, lang, category):
+                    continue
+
+                matched.append({
+                    "product_name": entry["product_name"],
+                    "brand": entry["brand"],
+                    "category": entry["category"],
+                    "key_features": entry["key_features"],
+                    "score": score,
+                })
+                if len(matched) >= top_k:
+                    break
+
+            if len(matched) >= top_k or exhausted or n_results >= size or len(results.keys) < n_results:
+                break
+            if not filtered or expansions >= SEARCH_MAX_EXPANSIONS:
+                # 필터에 맞는 후보가 드물면 검색 시간이 전체 크기로 늘어나지 않도록 모은 결과만 반환
+                break
+            expansions += 1
+            n_results = min(size, n_results * 4)
 
-        if score < 0.3:
-            continue
+    if not matched:
+        return json.dumps({"found": False, "message": "매칭되는 상품을 찾지 못했습니다."}, ensure_ascii=False)
 
+    return json.dumps({"found": True, "results": matched}, ensure_ascii=False)
+
+
+def _find_duplicate(
+    meta: dict, product_name: str, brand: str, country: str, lang: str
+) -> str | None:
+    """동일 상품명+브랜드+국가+언어 항목의 메타데이터 키를 보조 인덱스에서 O(1)로 찾습니다."""
+    key = _dedup_index.get(_dedup_key(product_name, brand, country, lang))
+    return key if key is not None and key in meta["products"] else None
+
+
+def _find_semantic_duplicate(
+    index: Index, meta: dict, vec: np.ndarray, brand: str, country: str, lang: str
+) -> str | None:
+    """이름이 달라도 같은 브랜드/국가/언어이고 임베딩 유사도가 임계값 이상인 항목의 키를 찾습니다."""
+    if SEMANTIC_DEDUP_THRESHOLD <= 0 or len(index) == 0:
+        return None
+    _, *target = _dedup_key("", brand, country, lang)
+    results = index.search(vec, min(5, len(index)))
+    for i in range(len(results.keys)):
+        if 1.0 - float(results.distances[i]) < SEMANTIC_DEDUP_THRESHOLD:
+            break
+        key = str(int(results.keys[i]))
         entry = meta["products"].get(key)
         if not entry:
             continue
+        _, *candidate = _dedup_key("", entry.get("brand", ""), entry.get("country", ""), entry.get("lang", ""))
+        if candidate == target:
+            return key
+    return None
+
+
+def _merge_duplicate(
+    meta: dict,
+    key: str,
+    normalized_product_name: str,
+    normalized_brand: str,
+    normalized_source: str,
+    normalized_country: str,
+    normalized_lang: str,
+    normalized_features: list[str],
+    match: str = "exact",
+) -> str:
+    """중복 항목의 key_features를 보강하고 응답을 반환합니다. _write_lock 안에서 호출합니다."""
+    entry = meta["products"][key]
+    existing_features = _normalize_features(entry.get("key_features", []))
+    merged_features = _normalize_features(existing_features + normalized_features)
+
+    if len(merged_features) > len(existing_features):
+        entry["key_features"] = merged_features
+        if not _normalize_text(entry.get("source", "")):
+            entry["source"] = normalized_source
+        _journal_update(key, entry)
+        _append_save_log(
+            {
+                "status": "updated",
+                "reason": "duplicate_enriched",
+                "match": match,
+                "product_name": normalized_product_name,
+                "brand": normalized_brand,
+                "source": normalized_source,
+                "country": normalized_country,
+                "lang": normalized_lang,
+                "added_features": len(merged_features) - len(existing_features),
+            }
+        )
+        return json.dumps(
+            {
+                "saved": True,
+                "updated": True,
+                "message": "기존 상품을 찾아 key_features를 보강했습니다.",
+            },
+            ensure_ascii=False,
+        )
 
-        matched.append({
-            "product_name": entry["product_name"],
-            "brand": entry["brand"],
-            "category": entry["category"],
-            "key_features": entry["key_features"],
-            "score": score,
-        })
-
-    if not matched:
-        return json.dumps({"found": False, "message": "매칭되는 상품을 찾지 못했습니다."}, ensure_ascii=False)
-
-    return json.dumps({"found": True, "results": matched}, ensure_ascii=False)
+    _append_save_log(
+        {
+            "status": "skipped",
+            "reason": "duplicate",
+            "match": match,
+            "product_name": normalized_product_name,
+            "brand": normalized_brand,
+            "source": normalized_source,
+            "country": normalized_country,
+            "lang": normalized_lang,
+        }
+    )
+    return json.dumps(
+        {
+            "saved": False,
+            "reason": "duplicate",
+            "message": "이미 동일한 상품이 DB에 존재합니다.",
+        },
+        ensure_ascii=False,
+    )
 
 
 def save_to_local_db(
@@ -338,88 +1201,57 @@ def save_to_local_db(
             ensure_ascii=False,
         )
 
-    index, meta = _get_index()
-
-    # 중복 체크: 동일 상품명+브랜드+국가+언어가 있는지 확인 (정규화 비교)
-    for entry in meta["products"].values():
-        same_product = _normalize_text(entry.get("product_name", "")).casefold() == normalized_product_name.casefold()
-        same_brand = _normalize_text(entry.get("brand", "")).casefold() == normalized_brand.casefold()
-        same_country = _normalize_text(entry.get("country", "")).casefold() == normalized_country.casefold()
-        same_lang = _normalize_text(entry.get("lang", "")).casefold() == normalized_lang.casefold()
-
-        if not (same_product and same_brand and same_country and same_lang):
-            continue
-
-        existing_features = _normalize_features(entry.get("key_features", []))
-        merged_features = _normalize_features(existing_features + normalized_features)
-
-        if len(merged_features) > len(existing_features):
-            entry["key_features"] = merged_features
-            if not _normalize_text(entry.get("source", "")):
-                entry["source"] = normalized_source
-            _persist()
-            _append_save_log(
-                {
-                    "status": "updated",
-                    "reason": "duplicate_enriched",
-                    "product_name": normalized_product_name,
-                    "brand": normalized_brand,
-                    "source": normalized_source,
-                    "country": normalized_country,
-                    "lang": normalized_lang,
-                    "added_features": len(merged_features) - len(existing_features),
-                }
-            )
-            return json.dumps(
-                {
-                    "saved": True,
-                    "updated": True,
-                    "message": "기존 상품을 찾아 key_features를 보강했습니다.",
-                },
-                ensure_ascii=False,
-            )
-
-        _append_save_log(
-            {
-                "status": "skipped",
-                "reason": "duplicate",
-                "product_name": normalized_product_name,
-                "brand": normalized_brand,
-                "source": normalized_source,
-                "country": normalized_country,
-                "lang": normalized_lang,
-            }
-        )
+    if READ_ONLY:
         return json.dumps(
             {
                 "saved": False,
-                "reason": "duplicate",
-                "message": "이미 동일한 상품이 DB에 존재합니다.",
+                "reason": "read_only",
+                "message": "읽기 전용 모드에서는 로컬 DB에 저장하지 않습니다.",
             },
             ensure_ascii=False,
         )
 
+    # 중복 체크: 동일 상품명+브랜드+국가+언어가 있는지 확인 (정규화 비교)
+    dedup_args = (
+        normalized_product_name, normalized_brand, normalized_source,
+        normalized_country, normalized_lang, normalized_features,
+    )
+    with _write_lock() as (index, meta):
+        dup_key = _find_duplicate(meta, normalized_product_name, normalized_brand, normalized_country, normalized_lang)
+        if dup_key is not None:
+            return _merge_duplicate(meta, dup_key, *dedup_args)
+
     try:
         doc_text = " ".join(normalized_features)
-        vec = np.array(_get_embedding([doc_text])[0], dtype=np.float32)
-
-        key = meta["next_key"]
-        meta["next_key"] = key + 1
-        index.add(key, vec)
-
-        meta["products"][str(key)] = {
-            "id": str(uuid.uuid4()),
-            "product_name": normalized_product_name,
-            "brand": normalized_brand,
-            "category": normalized_category,
-            "key_features": normalized_features,
-            "source": normalized_source,
-            "country": normalized_country,
-            "lang": normalized_lang,
-            "created_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
-        }
-
-        _persist()
+        vec = _get_embedding([doc_text])[0]
+
+        with span("vectordb.add"), _write_lock() as (index, meta):
+            # 임베딩을 기다리는 동안 다른 스레드/프로세스가 같은 상품을 저장했을 수 있으므로 다시 확인
+            dup_key = _find_duplicate(meta, normalized_product_name, normalized_brand, normalized_country, normalized_lang)
+            if dup_key is not None:
+                return _merge_duplicate(meta, dup_key, *dedup_args)
+            dup_key = _find_semantic_duplicate(index, meta, vec, normalized_brand, normalized_country, normalized_lang)
+            if dup_key is not None:
+                return _merge_duplicate(meta, dup_key, *dedup_args, match="semantic")
+
+            key = meta["next_key"]
+            meta["next_key"] = key + 1
+            with _search_gate.writing():
+                index.add(key, vec)
+
+            meta["products"][str(key)] = {
+                "id": str(uuid.uuid4()),
+                "product_name": normalized_product_name,
+                "brand": normalized_brand,
+                "category": normalized_category,
+                "key_features": normalized_features,
+                "source": normalized_source,
+                "country": normalized_country,
+                "lang": normalized_lang,
+                "created_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            _register_entry(str(key), meta["products"][str(key)])
+            _journal_add(key, meta["products"][str(key)], vec)
         _append_save_log(
             {
                 "status": "saved",
@@ -0,0 +1,169 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = "whatis_stage_duration_seconds"
+
+
+class Trace:
+    """이미지 하나를 분석하는 동안 단계별 소요 시간(span)을 모으는 추적기.
+
+    도구 함수는 스레드 풀에서 실행되므로 여러 스레드가 동시에 기록할 수 있습니다.
+    """
+
+    def __init__(self):
+        self._spans: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, duration_ms: float) -> None:
+        with self._lock:
+            self._spans.append((name, duration_ms))
+
+    def breakdown(self) -> dict[str, float]:
+        """단계 이름별 누적 소요 시간(ms)을 처음 기록된 순서대로 반환합니다.
+
+        단계는 중첩될 수 있습니다 (예: `agent.rag_agent`에는 `tool.search_local_db` 시간이 포함됨).
+        """
+        totals: dict[str, float] = {}
+        with self._lock:
+            for name, duration_ms in self._spans:
+                totals[name] = totals.get(name, 0.0) + duration_ms
+        return {name: round(ms, 1) for name, ms in totals.items()}
+
+
+_current: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("whatis_trace", default=None)
+
+
+@contextmanager
+def trace_scope() -> Iterator[Trace]:
+    """새 Trace를 현재 컨텍스트(asyncio 태스크)에 설정하고, 블록이 끝나면 원래대로 되돌립니다."""
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def record_span(name: str, duration_ms: float) -> None:
+    """현재 Trace에 이미 측정한 구간을 기록합니다. 추적 중이 아니면 무시합니다."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, duration_ms)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """블록 실행 시간을 현재 Trace에 name 단계로 기록합니다 (예외가 나도 기록)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, (time.perf_counter() - started) * 1000)
+
+
+def _quantile(sorted_values: list[float], q: float) -> float:
+    """선형 보간 백분위수 (numpy.percentile 기본 방식과 같음)."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = q * (len(sorted_values) - 1)
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+class StageMetrics:
+    """배치 전체의 이미지별 단계 소요 시간을 모아 p50/p95/p99를 계산하고 파일로 내보냅니다."""
+
+    def __init__(self):
+        self._durations: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+        self.started_ns = time.time_ns()
+
+    def record(self, breakdown: dict[str, float]) -> None:
+        with self._lock:
+            for name, ms in breakdown.items():
+                self._durations.setdefault(name, []).append(ms)
+
+    def summary(self) -> dict[str, dict]:
+        """단계별 {count, sum_ms, p50_ms, p95_ms, p99_ms}."""
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items()}
+        return {
+            name: {
+                "count": len(values),
+                "sum_ms": round(sum(values), 1),
+                **{f"p{int(q * 100)}_ms": round(_quantile(values, q), 1) for q in QUANTILES},
+            }
+            for name, values in durations.items()
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus 텍스트 노출 형식 (summary 타입, 초 단위)."""
+        lines = [
+            f"# HELP {METRIC_NAME} Per-stage latency of product image analysis.",
+            f"# TYPE {METRIC_NAME} summary",
+        ]
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items()}
+        for name, values in durations.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for q in QUANTILES:
+                lines.append(f'{METRIC_NAME}{{stage="{label}",quantile="{q}"}} {_quantile(values, q) / 1000:.6f}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{label}"}} {sum(values) / 1000:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{label}"}} {len(values)}')
+        return "\n".join(lines) + "\n"
+
+    def to_otel(self) -> dict:
+        """OpenTelemetry OTLP/JSON 메트릭 형식 (Summary 데이터 포인트, ms 단위)."""
+        now_ns = str(time.time_ns())
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items()}
+        data_points = [
+            {
+                "attributes": [{"key": "stage", "value": {"stringValue": name}}],
+                "startTimeUnixNano": str(self.started_ns),
+                "timeUnixNano": now_ns,
+                "count": str(len(values)),
+                "sum": sum(values),
+                "quantileValues": [{"quantile": q, "value": _quantile(values, q)} for q in QUANTILES],
+            }
+            for name, values in durations.items()
+        ]
+        return {
+            "resourceMetrics": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "whatis"}}]},
+                "scopeMetrics": [{
+                    "scope": {"name": "analyzer.tracing"},
+                    "metrics": [{
+                        "name": "whatis.stage.duration",
+                        "unit": "ms",
+                        "summary": {"dataPoints": data_points},
+                    }],
+                }],
+            }],
+        }
+
+    def write(self, path: Path) -> None:
+        """확장자가 .prom이면 Prometheus 텍스트, 그 외에는 OTLP/JSON으로 저장합니다."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".prom":
+            path.write_text(self.to_prometheus(), encoding="utf-8")
+        else:
+            path.write_text(json.dumps(self.to_otel(), ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+_metrics: StageMetrics | None = None
+
+
+def get_stage_metrics() -> StageMetrics:
+    """프로세스 전역 StageMetrics를 반환합니다 (싱글턴)."""
+    global _metrics
+    if _metrics is None:
+        _metrics = StageMetrics()
+    return _metrics
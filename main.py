@@ -1,20 +1,47 @@
+from __future__ import annotations
+
 import asyncio
+import itertools
 import json
 import logging
-import random
 import re
+import sqlite3
 import sys
 import time
 import mimetypes
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
 
 from dotenv import load_dotenv
-from google.adk.runners import InMemoryRunner
-from google.genai import types
-from PIL import Image
 
-from analyzer.agent import root_agent
+from analyzer import server, startup
+from analyzer.cache import ResultCache, make_result_key
+from analyzer.embedding import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_WAIT_MS,
+    configure_embedding_service,
+    get_embedding_service,
+)
+from analyzer.jobqueue import DEFAULT_LEASE_SECONDS, DEFAULT_QUEUE_PATH, JobQueue, default_worker_id
+from analyzer.phash import DEFAULT_THRESHOLD, PerceptualIndex
+from analyzer.preprocess import (
+    DEFAULT_MAX_EDGE,
+    OUTPUT_FORMATS,
+    PreparedImage,
+    PreprocessOptions,
+    prepare_image,
+)
+from analyzer.prompts import AGENT_VERSION
+from analyzer.scanner import is_manifest, read_manifest, reservoir_sample, scan_directory
+from analyzer.tracing import get_stage_metrics, record_span, span, trace_scope
+
+# ADK/genai/PIL/usearch/numpy와 에이전트는 import에만 수 초가 걸리므로 모듈 로드 시 가져오지 않음.
+# 사용 방법 출력이나 결과 캐시 hit은 이들 없이 끝나고, 그 외에는 startup.Preloader가 백그라운드에서 로드함
+if TYPE_CHECKING:
+    from google.genai import types
 
 load_dotenv(".env")
 
@@ -22,8 +49,8 @@ sys.stdout.reconfigure(encoding="utf-8")
 logging.getLogger("google.genai.models").setLevel(logging.ERROR)
 
 
-def load_image_as_part(image_path: str) -> types.Part:
-    """이미지 파일을 읽어 types.Part 객체로 변환합니다."""
+def read_image_file(image_path: str) -> tuple[bytes, str]:
+    """이미지 파일을 읽어 (원본 바이트, MIME 타입)을 반환합니다."""
     path = Path(image_path)
     if not path.exists():
         raise FileNotFoundError(f"이미지 파일을 찾을 수 없습니다: {image_path}")
@@ -32,31 +59,84 @@ def load_image_as_part(image_path: str) -> types.Part:
     if mime_type is None or not mime_type.startswith("image/"):
         raise ValueError(f"지원하지 않는 파일 형식입니다: {image_path}")
 
-    image_bytes = path.read_bytes()
+    return path.read_bytes(), mime_type
+
+
+def load_image_as_part(image_path: str, options: PreprocessOptions | None = None) -> types.Part:
+    """이미지 파일을 읽어 types.Part 객체로 변환합니다. options가 주어지면 전처리 후 변환합니다."""
+    from google.genai import types
+
+    image_bytes, mime_type = read_image_file(image_path)
+    if options is not None:
+        prepared = prepare_image(image_bytes, mime_type, options)
+        image_bytes, mime_type = prepared.data, prepared.mime_type
     return types.Part(
         inline_data=types.Blob(mime_type=mime_type, data=image_bytes)
     )
 
 
-def get_image_resolution(image_path: str) -> str:
-    """이미지 해상도를 'WxH' 문자열로 반환합니다."""
-    try:
-        with Image.open(image_path) as img:
-            w, h = img.size
-            return f"{w}x{h}"
-    except Exception:
-        return "unknown"
+APP_NAME = "whatis"
+USER_ID = "user"
+
+
+class RunnerPool:
+    """배치 전체에서 InMemoryRunner 하나를 재사용하고, 이미지별 세션을 빌려주고 회수합니다."""
+
+    def __init__(self, agent=None, app_name: str = APP_NAME):
+        from google.adk.runners import InMemoryRunner
+
+        if agent is None:
+            from analyzer.agent import root_agent
 
+            agent = root_agent
+        self.app_name = app_name
+        self.runner = InMemoryRunner(agent=agent, app_name=app_name)
 
-async def analyze_image(image_path: str, country: str = "KR", lang: str = "ko") -> tuple[str, dict]:
+    @asynccontextmanager
+    async def session(self, state: dict):
+        """세션을 생성해 빌려주고, 사용이 끝나면 삭제하여 메모리가 누적되지 않게 합니다."""
+        service = self.runner.session_service
+        session = await service.create_session(
+            app_name=self.app_name, user_id=USER_ID, state=state,
+        )
+        try:
+            yield session
+        finally:
+            await service.delete_session(
+                app_name=self.app_name, user_id=USER_ID, session_id=session.id,
+            )
+
+
+_runner_pool: RunnerPool | None = None
+
+
+def get_runner_pool() -> RunnerPool:
+    """프로세스 전역 RunnerPool을 반환합니다 (싱글턴)."""
+    global _runner_pool
+    if _runner_pool is None:
+        _runner_pool = RunnerPool()
+    return _runner_pool
+
+
+async def analyze_image(
+    image_path: str,
+    country: str = "KR",
+    lang: str = "ko",
+    pool: RunnerPool | None = None,
+    image_part: types.Part | None = None,
+) -> tuple[str, dict]:
     """상품 이미지를 분석하여 결과 텍스트와 토큰 사용량을 반환합니다."""
-    runner = InMemoryRunner(agent=root_agent, app_name="whatis")
-    session = await runner.session_service.create_session(
-        app_name="whatis", user_id="user",
-        state={"country": country, "lang": lang},
-    )
+    pool = pool or get_runner_pool()
+    if image_part is None:
+        image_part = load_image_as_part(image_path)
+    async with pool.session({"country": country, "lang": lang}) as session:
+        return await _run_session(pool.runner, session, image_part, country, lang)
+
+
+async def _run_session(runner, session, image_part: types.Part, country: str, lang: str) -> tuple[str, dict]:
+    """빌려온 세션에서 에이전트를 실행하고 최종 텍스트와 토큰 사용량을 수집합니다."""
+    from google.genai import types
 
-    image_part = load_image_as_part(image_path)
     content = types.Content(
         role="user",
         parts=[
@@ -69,19 +149,32 @@ async def analyze_image(image_path: str, country: str = "KR", lang: str = "ko")
     all_text_parts = []
     current_agent = None
     token_usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    # 에이전트 구간은 이전 에이전트의 마지막 이벤트부터 자기 마지막 이벤트까지 (LLM 호출 + 도구 실행)
+    segment_start = last_event_at = time.perf_counter()
+    tool_started: dict[str, float] = {}
     async for event in runner.run_async(
-        user_id="user", session_id=session.id, new_message=content
+        user_id=USER_ID, session_id=session.id, new_message=content
     ):
+        now = time.perf_counter()
         author = getattr(event, "author", None)
         if author and author != current_agent:
+            if current_agent is not None:
+                record_span(f"agent.{current_agent}", (last_event_at - segment_start) * 1000)
+                segment_start = last_event_at
             current_agent = author
             result_parts = []
             print(f"  >> [{current_agent}] 호출됨", flush=True)
+        last_event_at = now
         if event.content and event.content.parts:
             for part in event.content.parts:
                 if part.function_call:
+                    tool_started[part.function_call.name] = now
                     print(f"     -> tool: {part.function_call.name}()", flush=True)
                     continue
+                if part.function_response and part.function_response.name in tool_started:
+                    name = part.function_response.name
+                    record_span(f"tool.{name}", (now - tool_started.pop(name)) * 1000)
+                    continue
                 if part.text:
                     result_parts.append(part.text)
                     all_text_parts.append(part.text)
@@ -91,6 +184,8 @@ async def analyze_image(image_path: str, country: str = "KR", lang: str = "ko")
             token_usage["input_tokens"] += um.prompt_token_count or 0
             token_usage["output_tokens"] += um.candidates_token_count or 0
             token_usage["total_tokens"] += um.total_token_count or 0
+    if current_agent is not None:
+        record_span(f"agent.{current_agent}", (time.perf_counter() - segment_start) * 1000)
 
     final_text = "\n".join(result_parts).strip()
     if final_text:
@@ -103,9 +198,6 @@ async def analyze_image(image_path: str, country: str = "KR", lang: str = "ko")
     raise ValueError("모델이 텍스트 응답을 반환하지 않았습니다.")
 
 
-IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff"}
-
-
 def strip_code_block(text: str) -> str:
     """마크다운 코드 블록(```json ... ```)을 제거합니다."""
     m = re.search(r"```(?:json)?\s*\n?(.*?)```", text, re.DOTALL)
@@ -170,13 +262,130 @@ def validate_result_payload(payload: dict) -> None:
         raise ValueError("expiration_date 필드는 문자열 또는 빈 문자열이어야 합니다.")
 
 
-async def analyze_single(image_path: str, country: str = "KR", lang: str = "ko"):
-    """단일 이미지를 분석하고 결과를 반환합니다. 실패 시 최대 2회 재시도합니다."""
+async def analyze_single(
+    image_path: str,
+    country: str = "KR",
+    lang: str = "ko",
+    pool: RunnerPool | None = None,
+    cache: ResultCache | None = None,
+    refresh: bool = False,
+    phash_index: PerceptualIndex | None = None,
+    preprocess: PreprocessOptions | None = None,
+):
+    """단일 이미지를 분석하고 결과를 반환합니다. 실패 시 최대 2회 재시도합니다.
+
+    이미지는 preprocess 설정에 따라 축소/재인코딩된 뒤 전송되며, 결과의 `image` 필드에
+    원본 해상도와 원본/전송 바이트 크기가 기록됩니다.
+
+    cache가 주어지면 이미지 바이트/국가/언어/에이전트 버전이 같은 이전 결과를 재사용합니다.
+    phash_index가 함께 주어지면 재인코딩/리사이즈된 근접 중복 이미지의 결과도 재사용합니다
+    (source="near_duplicate").
+    refresh=True이면 캐시 조회를 건너뛰고 새 결과로 덮어씁니다.
+
+    결과의 `stages` 필드에는 단계별 소요 시간(ms)이 기록되고, 배치 전체 통계에도 누적됩니다.
+    """
+    with trace_scope() as trace:
+        parsed = await _analyze_single(
+            image_path, country, lang, pool, cache, refresh, phash_index, preprocess
+        )
+    parsed["stages"] = trace.breakdown()
+    get_stage_metrics().record(parsed["stages"])
+    startup.get_startup_profile().mark("첫 결과")
+    return parsed
+
+
+def find_near_duplicate(
+    cache: ResultCache, phash_index: PerceptualIndex, image_hash: int, scope: str
+) -> tuple[dict, int] | None:
+    """가장 가까운 근접 중복의 (캐시된 결과, 해밍 거리)를 찾습니다. SQLite를 읽으므로 스레드에서 호출합니다.
+
+    인덱스에는 있지만 결과가 캐시에서 사라진 항목은 인덱스에서 제거하고 None을 반환합니다.
+    """
+    match = phash_index.find(image_hash, scope)
+    if match is None:
+        return None
+    near = cache.peek(match[0])
+    if near is None:
+        phash_index.discard(match[0])
+        return None
+    return near, match[1]
+
+
+async def _analyze_single(
+    image_path: str,
+    country: str,
+    lang: str,
+    pool: RunnerPool | None,
+    cache: ResultCache | None,
+    refresh: bool,
+    phash_index: PerceptualIndex | None,
+    preprocess: PreprocessOptions | None,
+):
     start = time.time()
+    options = preprocess or PreprocessOptions()
+    version = f"{AGENT_VERSION}:{options.signature()}"
+    image_bytes, mime_type = read_image_file(image_path)
+    cache_key = None
+    scope = f"{country}|{lang}|{version}"
+    if cache is not None:
+        cache_key = make_result_key(image_bytes, country, lang, version)
+        cached = None
+        if not refresh:
+            # SQLite 호출은 다른 프로세스가 쓰기 lock을 잡으면 BUSY_TIMEOUT까지 기다리므로 이벤트 루프 밖에서 실행
+            with span("cache"):
+                try:
+                    cached = await asyncio.to_thread(cache.get, cache_key)
+                except sqlite3.Error as e:
+                    print(f"  !! 결과 캐시 조회 실패 (miss로 처리): {e}", flush=True)
+        if cached is not None:
+            cached["inference_time"] = f"{round(time.time() - start, 2)}s"
+            cached["token_usage"] = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+            cached["cache"] = "hit"
+            return cached
+
+    # 디코딩은 여기서 한 번만 수행하고 해상도/dHash/전송 바이트를 함께 얻음 (CPU 작업이므로 스레드에서 실행)
+    with span("preprocess"):
+        prepared: PreparedImage = await asyncio.to_thread(prepare_image, image_bytes, mime_type, options)
+    image_info = {
+        "resolution": prepared.resolution,
+        "original_bytes": prepared.original_bytes,
+        "sent_bytes": prepared.sent_bytes,
+    }
+    if prepared.grown:
+        image_info["grown"] = True
+    image_hash = prepared.image_hash if cache is not None and phash_index is not None else None
+
+    if image_hash is not None and not refresh:
+        with span("near_duplicate"):
+            try:
+                found = await asyncio.to_thread(find_near_duplicate, cache, phash_index, image_hash, scope)
+            except sqlite3.Error as e:
+                print(f"  !! 근접 중복 조회 실패 (건너뜀): {e}", flush=True)
+                found = None
+        if found is not None:
+            near, distance = found
+            phash_index.near_hits += 1
+            near["near_duplicate"] = {"distance": distance, "original_source": near.get("source", "")}
+            near["source"] = "near_duplicate"
+            near["image"] = image_info
+            near["inference_time"] = f"{round(time.time() - start, 2)}s"
+            near["token_usage"] = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+            near["cache"] = "near_hit"
+            return near
+
+    # 여기서부터 에이전트가 필요하므로 백그라운드 로드(모듈 import, 러너/인덱스/클라이언트 준비)가 끝나길 기다림
+    await startup.wait_preload()
+    from google.genai import types
+
+    image_part = types.Part(
+        inline_data=types.Blob(mime_type=prepared.mime_type, data=prepared.data)
+    )
+
     last_error = None
     for attempt in range(1, MAX_RETRIES + 2):  # 1 + 2 retries = 3 attempts
         try:
-            result, token_usage = await analyze_image(image_path, country, lang)
+            with span("agent"):
+                result, token_usage = await analyze_image(image_path, country, lang, pool, image_part)
             if not result.strip():
                 raise ValueError("모델 응답이 비어 있습니다.")
 
@@ -191,24 +400,363 @@ async def analyze_single(image_path: str, country: str = "KR", lang: str = "ko")
                 raise ValueError(f"JSON 파싱 실패: {e}") from e
 
             validate_result_payload(parsed)
-            parsed["inference_time"] = f"{elapsed}s"
-            parsed["token_usage"] = token_usage
-            return parsed
+            break
         except Exception as e:
             last_error = e
             if attempt <= MAX_RETRIES:
                 print(f"  !! API 오류 (시도 {attempt}/{MAX_RETRIES + 1}): {e}", flush=True)
                 print(f"  !! {RETRY_DELAY}초 후 재시도...", flush=True)
-                await asyncio.sleep(RETRY_DELAY)
+                with span("retry_wait"):
+                    await asyncio.sleep(RETRY_DELAY)
             else:
                 raise last_error
 
+    parsed["image"] = image_info
+    # 캐시 저장 실패(다른 프로세스가 lock을 오래 잡는 등)는 모델 호출을 다시 할 이유가 아니므로 재시도 밖에서 처리
+    if cache_key is not None and "error" not in parsed:
+        try:
+            await asyncio.to_thread(cache.put, cache_key, parsed)
+        except sqlite3.Error as e:
+            print(f"  !! 결과 캐시 저장 실패: {e}", flush=True)
+        else:
+            # 결과는 저장되었으므로 해시 등록 실패는 근접 중복 재사용만 놓치고 분석은 성공으로 처리
+            if image_hash is not None:
+                try:
+                    await asyncio.to_thread(phash_index.add, image_hash, scope, cache_key)
+                except sqlite3.Error as e:
+                    print(f"  !! 근접 중복 인덱스 등록 실패: {e}", flush=True)
+    parsed["inference_time"] = f"{elapsed}s"
+    parsed["token_usage"] = token_usage
+    return parsed
+
+
+class JsonlWriter:
+    """분석 결과를 완료되는 즉시 JSONL 파일에 한 줄씩 기록하고 flush합니다."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._fp = path.open("a", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        self._fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # 프로세스가 강제 종료되어도 이미 끝난 결과는 파일에 남도록 매번 flush
+        self._fp.flush()
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+def load_completed_paths(path: Path) -> set[str]:
+    """이전 JSONL 결과에서 성공한 이미지 경로 집합을 반환합니다.
+
+    같은 경로가 여러 번 기록되어 있으면 마지막 기록을 기준으로 판단하며,
+    강제 종료로 잘린 마지막 줄은 무시합니다.
+    """
+    status: dict[str, bool] = {}
+    if not path.exists():
+        return set()
+    with path.open(encoding="utf-8") as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            record_path = record.get("path")
+            if not record_path:
+                continue
+            status[record_path] = "error" not in record.get("result", {})
+    return {p for p, ok in status.items() if ok}
+
+
+# 디렉토리 탐색/매니페스트 읽기를 이벤트 루프 밖(스레드)에서 한 번에 진행하는 항목 수
+SCAN_CHUNK = 32
+
+
+def _take_images(numbered: Iterator[tuple[int, Path]], n: int) -> list[tuple[int, Path, str]]:
+    """다음 n개의 (번호, 경로, 절대 경로)를 꺼냅니다. 파일시스템 접근이 있으므로 스레드에서 호출합니다."""
+    return [(idx, img, str(img.resolve())) for idx, img in itertools.islice(numbered, n)]
+
+
+async def analyze_batch(
+    images,
+    writer: JsonlWriter,
+    country: str = "KR",
+    lang: str = "ko",
+    concurrency: int = 1,
+    cache: ResultCache | None = None,
+    refresh: bool = False,
+    phash_index: PerceptualIndex | None = None,
+    preprocess: PreprocessOptions | None = None,
+    total: int | None = None,
+    skip_paths: set[str] | None = None,
+) -> dict:
+    """여러 이미지를 최대 concurrency개까지 동시에 분석하고 결과를 writer로 바로 기록합니다.
+
+    결과는 메모리에 모으지 않고 완료 순서대로 기록되며, 각 레코드의 `index`로 입력 순서를 알 수 있습니다.
+    skip_paths에 포함된 경로(이전 실행에서 성공한 이미지)는 건너뜁니다.
+    images는 SCAN_CHUNK개씩 스레드에서 꺼내므로 큰 디렉토리를 읽는 동안에도 이벤트 루프가 멈추지 않습니다.
+    """
+    summary = {"succeeded": 0, "failed": 0, "skipped": 0, "grown": 0}
+    # 러너는 첫 캐시 miss 때 만들어짐 (모두 캐시 hit이면 에이전트를 로드하지 않음)
+    pool = None
+    skip_paths = skip_paths or set()
+    numbered = enumerate(images, 1)
+    buffered: deque[tuple[int, Path, str]] = deque()
+    scan_lock = asyncio.Lock()
+    total_label = f"/{total}" if total is not None else ""
+
+    async def next_image() -> tuple[int, Path, str] | None:
+        # 한 번에 한 워커만 이터레이터를 진행 (제너레이터는 동시에 실행할 수 없음)
+        async with scan_lock:
+            if not buffered:
+                buffered.extend(await asyncio.to_thread(_take_images, numbered, SCAN_CHUNK))
+            return buffered.popleft() if buffered else None
+
+    async def run_one(idx: int, img: Path, resolved: str) -> None:
+        print(f"[{idx}{total_label}] 분석 중: {img.name} ...", flush=True)
+        try:
+            parsed = await analyze_single(
+                str(img), country, lang, pool, cache, refresh, phash_index, preprocess
+            )
+        except Exception as e:
+            parsed = {
+                "error": "analysis_failed",
+                "message": str(e),
+                "inference_time": "",
+            }
+            print(f"[{idx}{total_label}] 실패: {img.name} ({e})\n", flush=True)
+        if "error" not in parsed:
+            summary["succeeded"] += 1
+            image_info = parsed.get("image", {})
+            if image_info.get("grown"):
+                summary["grown"] += 1
+            tu = parsed.get("token_usage", {})
+            resolution = image_info.get("resolution", "unknown")
+            print(
+                f"[{idx}{total_label}] 완료: {img.name} ({resolution}, {parsed.get('inference_time', '')})"
+                f" | tokens: in={tu.get('input_tokens', 0)} out={tu.get('output_tokens', 0)} total={tu.get('total_tokens', 0)}\n",
+                flush=True,
+            )
+        else:
+            summary["failed"] += 1
+        writer.write({"index": idx, "file": img.name, "path": resolved, "result": parsed})
+
+    async def worker() -> None:
+        # 워커들이 하나의 이터레이터를 나눠 가지므로 대기 중인 작업이 concurrency개를 넘지 않음
+        while (item := await next_image()) is not None:
+            idx, img, resolved = item
+            if resolved in skip_paths:
+                summary["skipped"] += 1
+                continue
+            await run_one(idx, img, resolved)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return summary
+
+
+# 할 작업이 없지만 다른 워커가 lease를 가진 작업이 있을 때 다시 확인하는 주기 (lease 만료 시 가져가기 위함)
+QUEUE_POLL_INTERVAL = 5.0  # seconds
+
+
+async def run_worker(
+    queue: JobQueue,
+    worker_id: str,
+    concurrency: int = 1,
+    cache: ResultCache | None = None,
+    phash_index: PerceptualIndex | None = None,
+    preprocess: PreprocessOptions | None = None,
+) -> dict:
+    """작업 큐에서 이미지를 lease로 가져와 analyze_single로 분석하고 결과를 큐에 기록합니다.
+
+    concurrency개의 작업을 동시에 처리하며, 가진 lease는 lease 시간의 1/3마다 갱신합니다.
+    대기 작업도, 다른 워커가 처리 중인 작업도 없으면 반환합니다. 처리 중인 작업이 남아 있으면
+    그 워커가 죽어 lease가 만료될 경우에 대비해 주기적으로 다시 확인합니다.
+    종료될 때 끝내지 못한 작업은 대기 상태로 돌려놓습니다.
+    """
+    summary = {"succeeded": 0, "failed": 0, "duplicate": 0}
+
+    async def heartbeat() -> None:
+        # 갱신이 실패해도(다른 워커가 lock을 오래 잡는 등) 멈추지 않고, lease가 끝나기 전에 다시 시도
+        interval = queue.lease_seconds / 3
+        delay = interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await asyncio.to_thread(queue.renew, worker_id)
+                delay = interval
+            except sqlite3.Error as e:
+                delay = min(interval, QUEUE_POLL_INTERVAL)
+                print(f"  !! lease 갱신 실패 ({delay:g}초 후 재시도): {e}", flush=True)
+
+    async def worker() -> None:
+        while True:
+            jobs = await asyncio.to_thread(queue.claim, worker_id)
+            if not jobs:
+                stats = await asyncio.to_thread(queue.stats)
+                if not stats["leased"]:
+                    return
+                await asyncio.sleep(QUEUE_POLL_INTERVAL)
+                continue
+            job = jobs[0]
+            name = Path(job.path).name
+            print(f"[job {job.id}] 분석 중: {name} (시도 {job.attempts}) ...", flush=True)
+            try:
+                parsed = await analyze_single(
+                    job.path, job.country, job.lang, None, cache, False, phash_index, preprocess
+                )
+            except Exception as e:
+                parsed = {"error": "analysis_failed", "message": str(e), "inference_time": ""}
+            if not await asyncio.to_thread(queue.complete, job.id, parsed):
+                # lease가 만료된 사이 다른 워커가 먼저 끝낸 작업
+                summary["duplicate"] += 1
+                print(f"[job {job.id}] 이미 다른 워커가 완료함: {name}\n", flush=True)
+            elif "error" in parsed:
+                summary["failed"] += 1
+                print(f"[job {job.id}] 실패: {name} ({parsed.get('message', parsed['error'])})\n", flush=True)
+            else:
+                summary["succeeded"] += 1
+                print(f"[job {job.id}] 완료: {name} ({parsed.get('inference_time', '')})\n", flush=True)
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        beat.cancel()
+        released = await asyncio.to_thread(queue.release, worker_id)
+        if released:
+            print(f"끝내지 못한 작업 {released}개를 대기 상태로 돌려놓음")
+    return summary
+
+
+def print_queue_stats(queue: JobQueue) -> None:
+    stats = queue.stats()
+    print(
+        f"작업 큐 {queue.path}: 전체 {stats['total']}개 | 대기 {stats['pending']}, 처리 중 {stats['leased']}"
+        f" (워커 {stats['workers']}개, lease 만료 {stats['expired']}), 완료 {stats['done']}, 실패 {stats['failed']}"
+    )
+
+
+def configure_agent_tools(semantic_dedup: float, read_only: bool, search_ttl: float | None) -> None:
+    """로컬 DB 도구와 웹 검색 캐시 설정을 적용합니다 (preload 단계, 인덱스를 열기 전에 실행)."""
+    from analyzer.search import configure_search
+    from analyzer.tools import configure_read_only, configure_semantic_dedup
+
+    configure_semantic_dedup(semantic_dedup)
+    if search_ttl is not None:
+        configure_search(ttl=search_ttl)
+    if read_only:
+        configure_read_only(True)
+
+
+def warm_up_index() -> int:
+    """로컬 DB 인덱스와 메타데이터를 로드하고 상품 수를 반환합니다."""
+    from analyzer.tools import warm_up
+
+    return warm_up()
+
+
+def warm_up_clients() -> None:
+    """임베딩/검색/모델 클라이언트는 첫 사용 때 만들어지므로 첫 요청이 기다리지 않게 미리 만들어 둡니다."""
+    from analyzer.agent import root_agent
+    from analyzer.search import get_search_backend
+
+    get_embedding_service().client
+    getattr(get_search_backend(), "client", None)
+    for agent in (root_agent.image_analyzer, root_agent.rag_agent):
+        getattr(getattr(agent, "canonical_model", None), "api_client", None)
+
+
+def preload_steps(semantic_dedup: float, read_only: bool, search_ttl: float | None) -> list:
+    """백그라운드에서 실행할 초기화 단계: 무거운 모듈 import → 도구 설정 → 러너 → 로컬 DB 인덱스 → 클라이언트."""
+    return startup.import_steps() + [
+        ("configure tools", lambda: configure_agent_tools(semantic_dedup, read_only, search_ttl)),
+        ("init runner", get_runner_pool),
+        ("init local db index", warm_up_index),
+        ("init clients", warm_up_clients),
+    ]
+
+
+async def serve(
+    country: str,
+    lang: str,
+    concurrency: int,
+    queue_size: int,
+    host: str,
+    port: int,
+    unix_path: Path | None,
+    cache: ResultCache | None,
+    phash_index: PerceptualIndex | None,
+    preprocess: PreprocessOptions,
+) -> None:
+    """분석 서버를 실행합니다.
+
+    에이전트 러너, 로컬 DB 인덱스, 임베딩/검색/모델 클라이언트는 백그라운드 preload가 준비한 것을
+    요청 사이에 재사용하며, 요청마다 analyze_single과 같은 JSON을 돌려줍니다.
+    요청의 country/lang이 없으면 서버 설정을 씁니다.
+    """
+    started = time.perf_counter()
+    await startup.wait_preload()
+    pool = get_runner_pool()
+    count = await asyncio.to_thread(warm_up_index)
+    print(f"워밍업 완료: 로컬 DB {count}개 상품 ({time.perf_counter() - started:.2f}s)")
+
+    async def handle(request: dict) -> dict:
+        image_path = request["path"]
+        print(f"분석 중: {image_path} ...", flush=True)
+        try:
+            return await analyze_single(
+                image_path,
+                str(request.get("country") or country),
+                str(request.get("lang") or lang),
+                pool, cache, bool(request.get("refresh")), phash_index, preprocess,
+            )
+        except Exception as e:
+            print(f"실패: {image_path} ({e})", flush=True)
+            return {"error": "analysis_failed", "message": str(e)}
+
+    analysis_server = server.AnalysisServer(handle, concurrency, queue_size)
+    try:
+        await analysis_server.serve(host, port, unix_path)
+    except asyncio.CancelledError:
+        pass
+    stats = analysis_server.stats()
+    print(f"\n서버 종료: 성공 {stats['processed']}건, 실패 {stats['failed']}건, 거절 {stats['rejected']}건, 연결 끊겨 취소 {stats['cancelled']}건")
+
 
 async def main():
+    profile = startup.get_startup_profile()
+    profile.mark("CLI 모듈 로드")
     argv = sys.argv[1:]
     country = "KR"
     lang = "ko"
     use_random = False
+    concurrency = None
+    use_cache = True
+    refresh = False
+    phash_threshold = DEFAULT_THRESHOLD
+    max_edge = DEFAULT_MAX_EDGE
+    image_format = "jpeg"
+    resume_path = None
+    include: list[str] = []
+    exclude: list[str] = []
+    recursive = True
+    embed_batch_size = DEFAULT_MAX_BATCH_SIZE
+    embed_wait_ms = DEFAULT_MAX_WAIT_MS
+    semantic_dedup = 0.0
+    readonly_db = False
+    metrics_path = None
+    search_ttl_hours = None
+    host = server.DEFAULT_HOST
+    port = server.DEFAULT_PORT
+    socket_path = None
+    queue_size = server.DEFAULT_QUEUE_SIZE
+    profile_startup = False
+    queue_path = DEFAULT_QUEUE_PATH
+    lease_seconds = DEFAULT_LEASE_SECONDS
+    worker_id = None
+    export_path = None
+    retry_failed = False
     positional = []
 
     i = 0
@@ -219,6 +767,84 @@ async def main():
         elif argv[i] == "--lang" and i + 1 < len(argv):
             lang = argv[i + 1]
             i += 2
+        elif argv[i] == "--concurrency" and i + 1 < len(argv):
+            concurrency = max(1, int(argv[i + 1]))
+            i += 2
+        elif argv[i] == "--no-cache":
+            use_cache = False
+            i += 1
+        elif argv[i] == "--phash-threshold" and i + 1 < len(argv):
+            phash_threshold = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--max-edge" and i + 1 < len(argv):
+            max_edge = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--image-format" and i + 1 < len(argv):
+            image_format = argv[i + 1].lower()
+            i += 2
+        elif argv[i] == "--resume" and i + 1 < len(argv):
+            resume_path = Path(argv[i + 1])
+            i += 2
+        elif argv[i] == "--include" and i + 1 < len(argv):
+            include.append(argv[i + 1])
+            i += 2
+        elif argv[i] == "--exclude" and i + 1 < len(argv):
+            exclude.append(argv[i + 1])
+            i += 2
+        elif argv[i] == "--no-recursive":
+            recursive = False
+            i += 1
+        elif argv[i] == "--embed-batch-size" and i + 1 < len(argv):
+            embed_batch_size = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--embed-wait-ms" and i + 1 < len(argv):
+            embed_wait_ms = float(argv[i + 1])
+            i += 2
+        elif argv[i] == "--semantic-dedup" and i + 1 < len(argv):
+            semantic_dedup = float(argv[i + 1])
+            i += 2
+        elif argv[i] == "--search-ttl" and i + 1 < len(argv):
+            search_ttl_hours = float(argv[i + 1])
+            i += 2
+        elif argv[i] == "--metrics" and i + 1 < len(argv):
+            metrics_path = Path(argv[i + 1])
+            i += 2
+        elif argv[i] == "--host" and i + 1 < len(argv):
+            host = argv[i + 1]
+            i += 2
+        elif argv[i] == "--port" and i + 1 < len(argv):
+            port = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--socket" and i + 1 < len(argv):
+            socket_path = Path(argv[i + 1])
+            i += 2
+        elif argv[i] == "--queue-size" and i + 1 < len(argv):
+            queue_size = max(1, int(argv[i + 1]))
+            i += 2
+        elif argv[i] == "--queue" and i + 1 < len(argv):
+            queue_path = Path(argv[i + 1])
+            i += 2
+        elif argv[i] == "--lease" and i + 1 < len(argv):
+            lease_seconds = max(1.0, float(argv[i + 1]))
+            i += 2
+        elif argv[i] == "--worker-id" and i + 1 < len(argv):
+            worker_id = argv[i + 1]
+            i += 2
+        elif argv[i] == "--export" and i + 1 < len(argv):
+            export_path = Path(argv[i + 1])
+            i += 2
+        elif argv[i] == "--retry-failed":
+            retry_failed = True
+            i += 1
+        elif argv[i] == "--profile-startup":
+            profile_startup = True
+            i += 1
+        elif argv[i] == "--readonly-db":
+            readonly_db = True
+            i += 1
+        elif argv[i] == "--refresh":
+            refresh = True
+            i += 1
         elif argv[i] == "--random":
             use_random = True
             i += 1
@@ -227,82 +853,230 @@ async def main():
             i += 1
 
     if len(positional) < 1:
-        print("사용법: python main.py <이미지_파일_경로 또는 디렉토리> [샘플 수] [옵션]")
+        print("사용법: python main.py <이미지_파일_경로 | 디렉토리 | 매니페스트(.txt/.jsonl) | -> [샘플 수] [옵션]")
+        print("        python main.py serve [--host H] [--port N | --socket PATH] [--queue-size N] [옵션]")
+        print("        python main.py enqueue <디렉토리 | 매니페스트 | -> [샘플 수] [--queue PATH] [--retry-failed]")
+        print("        python main.py worker [--queue PATH] [--concurrency N] [--lease S] [옵션]")
+        print("        python main.py queue-status [--queue PATH] [--export FILE]")
         print()
         print("옵션:")
         print("  --country CODE  국가 코드 (기본: KR)")
         print("  --lang CODE     언어 코드 (기본: ko)")
         print("  --random        랜덤 샘플 선택")
+        print(f"  --concurrency N 동시에 분석할 이미지 수 (기본: 1, serve는 {server.DEFAULT_CONCURRENCY})")
+        print("  --no-cache      결과 캐시를 사용하지 않음")
+        print("  --refresh       캐시를 무시하고 다시 분석한 뒤 캐시 갱신")
+        print(f"  --phash-threshold N  근접 중복으로 볼 dHash 해밍 거리 (기본: {DEFAULT_THRESHOLD}, 음수면 비활성화)")
+        print(f"  --max-edge N    전송 전 긴 변 최대 픽셀 (기본: {DEFAULT_MAX_EDGE})")
+        print("  --image-format F  전송 형식 jpeg | webp | original (기본: jpeg)")
+        print("  --resume FILE   이전 JSONL 결과에서 성공한 이미지는 건너뛰고 이어서 기록")
+        print("  --include GLOB  포함할 경로 패턴 (여러 번 지정 가능)")
+        print("  --exclude GLOB  제외할 경로/디렉토리 패턴 (여러 번 지정 가능)")
+        print("  --no-recursive  하위 디렉토리를 탐색하지 않음")
+        print(f"  --embed-batch-size N  임베딩 요청 1회당 최대 텍스트 수 (기본: {DEFAULT_MAX_BATCH_SIZE})")
+        print(f"  --embed-wait-ms MS    임베딩 요청을 모으는 대기 시간 (기본: {DEFAULT_MAX_WAIT_MS})")
+        print("  --semantic-dedup T    로컬 DB 저장 시 유사도 T 이상인 같은 브랜드 상품을 중복으로 병합 (기본: 비활성화)")
+        print("  --readonly-db   로컬 DB 스냅샷을 메모리 매핑으로 읽기만 함 (저장 안 함, 여러 워커가 페이지 캐시 공유)")
+        print("  --search-ttl H  웹 검색 결과 캐시 유효 시간(시간 단위, 기본: 168, 0이면 캐시 안 함)")
+        print("  --metrics FILE  단계별 지연 p50/p95/p99를 저장 (.prom: Prometheus 텍스트, 그 외: OpenTelemetry JSON)")
+        print(f"  --host H, --port N    serve 모드 수신 주소 (기본: {server.DEFAULT_HOST}:{server.DEFAULT_PORT})")
+        print("  --socket PATH   serve 모드에서 TCP 대신 Unix 소켓으로 수신")
+        print(f"  --queue-size N  serve 모드에서 대기할 수 있는 최대 요청 수 (기본: {server.DEFAULT_QUEUE_SIZE})")
+        print(f"  --queue PATH    작업 큐 SQLite 파일 (여러 호스트가 공유 파일시스템에서 함께 사용, 기본: {DEFAULT_QUEUE_PATH})")
+        print(f"  --lease S       worker가 작업을 잡아두는 시간(초), 갱신이 끊기면 다른 워커가 가져감 (기본: {DEFAULT_LEASE_SECONDS:g})")
+        print("  --worker-id ID  worker 식별자 (기본: 호스트명:PID)")
+        print("  --retry-failed  enqueue 시 실패한 작업을 다시 대기 상태로 돌림")
+        print("  --export FILE   queue-status 시 완료/실패 결과를 JSONL로 저장")
+        print("  --profile-startup  모듈 import/초기화 단계별 시간과 첫 결과까지의 시간을 출력")
         print()
         print("예시: python main.py product.jpg")
         print("예시: python main.py datasets/images 5 --random")
         print("예시: python main.py datasets/images 3 --country US --lang en")
+        print("예시: python main.py datasets/images --concurrency 8")
+        print("예시: python main.py datasets/images --resume outputs/result_20260101_120000.jsonl")
+        print("예시: find /data -name '*.jpg' | python main.py - --concurrency 16")
+        print("예시: python main.py serve --port 8765 --concurrency 8")
+        print("예시: python main.py enqueue /shared/images --queue /shared/queue.sqlite3")
+        print("예시: python main.py worker --queue /shared/queue.sqlite3 --concurrency 8")
         sys.exit(1)
 
     target = Path(positional[0])
+    # 작업 큐 관리 명령은 에이전트를 쓰지 않으므로 preload를 시작하기 전에 처리
+    if positional[0] in ("enqueue", "queue-status") and not target.is_file():
+        queue = JobQueue(queue_path, lease_seconds)
+        try:
+            if positional[0] == "enqueue":
+                source = positional[1] if len(positional) >= 2 else ""
+                if Path(source).is_dir():
+                    images = scan_directory(Path(source), include, exclude, recursive)
+                elif is_manifest(source):
+                    images = read_manifest(source, include, exclude)
+                else:
+                    print(f"enqueue할 디렉토리 또는 매니페스트를 지정하세요: {source}")
+                    sys.exit(1)
+                if len(positional) >= 3:
+                    count = int(positional[2])
+                    images = reservoir_sample(images, count) if use_random else itertools.islice(images, count)
+                if retry_failed:
+                    print(f"실패한 작업 {queue.retry_failed()}개를 다시 대기 상태로 돌림")
+                added = queue.enqueue((str(img.resolve()) for img in images), country, lang)
+                print(f"작업 {added}개 추가 (country={country}, lang={lang}, 이미 큐에 있는 경로는 건너뜀)")
+            print_queue_stats(queue)
+            if export_path is not None:
+                print(f"결과 {queue.export(export_path)}개 저장: {export_path}")
+        finally:
+            queue.close()
+        return
+
     sample_count = int(positional[1]) if len(positional) >= 2 else None
+    if image_format not in OUTPUT_FORMATS and image_format != "original":
+        print(f"지원하지 않는 --image-format 값입니다: {image_format}")
+        sys.exit(1)
+    preprocess = PreprocessOptions(max_edge=max_edge, format=image_format)
+    configure_embedding_service(embed_batch_size, embed_wait_ms)
+    search_ttl = search_ttl_hours * 3600 if search_ttl_hours is not None else None if use_cache else 0
+    # 디렉토리 탐색/캐시 확인과 겹치도록 에이전트 관련 import와 초기화를 백그라운드에서 먼저 시작
+    preloader = startup.start_preload(preload_steps(semantic_dedup, readonly_db, search_ttl))
     print(f"설정: country={country}, lang={lang}\n")
+    cache = ResultCache() if use_cache else None
+    phash_index = PerceptualIndex(threshold=phash_threshold) if use_cache and phash_threshold >= 0 else None
+    if phash_index is not None:
+        cache.on_evict = phash_index.discard_many
+    output_path = None
 
-    if target.is_dir():
-        images = sorted(
-            f for f in target.iterdir()
-            if f.suffix.lower() in IMAGE_EXTENSIONS
+    if positional[0] == "serve" and not target.is_file():
+        await serve(
+            country, lang, concurrency or server.DEFAULT_CONCURRENCY, queue_size, host, port, socket_path,
+            cache, phash_index, preprocess,
         )
-        if not images:
-            print(f"디렉토리에 이미지 파일이 없습니다: {target}")
+    elif positional[0] == "worker" and not target.is_file():
+        queue = JobQueue(queue_path, lease_seconds)
+        worker_id = worker_id or default_worker_id()
+        concurrency = concurrency or 1
+        print(f"워커 {worker_id} 시작 (동시 실행 {concurrency}개, lease {lease_seconds:g}초)")
+        print_queue_stats(queue)
+        print()
+        try:
+            summary = await run_worker(queue, worker_id, concurrency, cache, phash_index, preprocess)
+            print(
+                f"성공 {summary['succeeded']}개, 실패 {summary['failed']}개,"
+                f" 다른 워커가 먼저 완료 {summary['duplicate']}개"
+            )
+            print_queue_stats(queue)
+        finally:
+            queue.close()
+    elif target.is_dir() or is_manifest(positional[0]):
+        if target.is_dir():
+            images = scan_directory(target, include, exclude, recursive)
+        else:
+            images = read_manifest(positional[0], include, exclude)
+
+        # 열거가 끝나기 전에 분석을 시작할 수 있도록 목록을 만들지 않고 첫 항목만 확인
+        first = await asyncio.to_thread(next, images, None)
+        if first is None:
+            print(f"분석할 이미지 파일이 없습니다: {positional[0]}")
             sys.exit(1)
+        profile.mark("첫 이미지 발견")
+        images = itertools.chain([first], images)
 
+        total = None
         if sample_count is not None:
             if use_random:
-                images = random.sample(images, min(sample_count, len(images)))
+                images = reservoir_sample(images, sample_count)
+                total = len(images)
             else:
-                images = images[:sample_count]
+                images = itertools.islice(images, sample_count)
 
-        total = len(images)
         mode = "랜덤 샘플" if use_random and sample_count else "샘플" if sample_count else ""
-        label = f"총 {total}개 이미지 분석" + (f" ({mode})" if mode else "")
+        label = (f"총 {total}개 이미지 분석" if total is not None else "이미지 분석 (탐색과 동시에 진행)")
+        label += f" ({mode})" if mode else ""
+        concurrency = concurrency or 1
+        if concurrency > 1:
+            label += f", 동시 실행 {concurrency}개"
         print(f"{label}\n")
-        results = []
-        for idx, img in enumerate(images, 1):
-            resolution = get_image_resolution(str(img))
-            print(f"[{idx}/{total}] 분석 중: {img.name} ({resolution}) ...", flush=True)
-            try:
-                parsed = await analyze_single(str(img), country, lang)
-            except Exception as e:
-                parsed = {
-                    "error": "analysis_failed",
-                    "message": str(e),
-                    "inference_time": "",
-                }
-                print(f"[{idx}/{total}] 실패: {img.name} ({e})\n", flush=True)
-            results.append({"file": img.name, "result": parsed})
-            if "error" not in parsed:
-                tu = parsed.get("token_usage", {})
-                print(
-                    f"[{idx}/{total}] 완료: {img.name} ({parsed.get('inference_time', '')})"
-                    f" | tokens: in={tu.get('input_tokens', 0)} out={tu.get('output_tokens', 0)} total={tu.get('total_tokens', 0)}\n",
-                    flush=True,
-                )
 
-        output = results
+        if resume_path is not None:
+            output_path = resume_path
+            completed = load_completed_paths(resume_path)
+            print(f"이어서 실행: {resume_path} (이미 성공한 이미지 {len(completed)}개 건너뜀)\n")
+        else:
+            output_path = Path("outputs") / f"result_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+            completed = set()
+
+        writer = JsonlWriter(output_path)
+        try:
+            summary = await analyze_batch(
+                images, writer, country, lang, concurrency, cache, refresh, phash_index, preprocess,
+                total=total, skip_paths=completed,
+            )
+        finally:
+            writer.close()
+        print(
+            f"성공 {summary['succeeded']}개, 실패 {summary['failed']}개, 건너뜀 {summary['skipped']}개"
+        )
+        if summary["grown"]:
+            print(f"  전처리 후 원본보다 커진 이미지 {summary['grown']}개 (이미 강하게 압축된 원본을 축소/회전)")
     else:
         try:
-            output = await analyze_single(str(target), country, lang)
+            output = await analyze_single(
+                str(target), country, lang,
+                cache=cache, refresh=refresh, phash_index=phash_index, preprocess=preprocess,
+            )
         except Exception as e:
             output = {
                 "error": "analysis_failed",
                 "message": str(e),
             }
 
-    output_json = json.dumps(output, ensure_ascii=False, indent=2)
-    print(output_json)
+        output_json = json.dumps(output, ensure_ascii=False, indent=2)
+        print(output_json)
+
+        output_dir = Path("outputs")
+        output_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = output_dir / f"result_{timestamp}.json"
+        output_path.write_text(output_json, encoding="utf-8")
+
+    if cache is not None:
+        stats = cache.stats()
+        near_hits = phash_index.near_hits if phash_index is not None else 0
+        print(f"\n캐시: hit={stats['hits']}, near_hit={near_hits}, miss={stats['misses'] - near_hits}")
+        cache.close()
+    if phash_index is not None:
+        phash_index.close()
+
+    # 검색 모듈이 로드되지 않았다면 (모두 캐시 hit 등) 검색도 없었으므로 통계를 위해 로드하지 않음
+    search = sys.modules.get("analyzer.search")
+    search_cache = search.get_search_cache() if search is not None else None
+    if search_cache is not None and (search_cache.hits or search_cache.misses):
+        stats = search_cache.stats()
+        print(f"검색 캐시: hit={stats['hits']}, miss={stats['misses']}")
+
+    embed_stats = get_embedding_service().stats()
+    if embed_stats["batches"]:
+        print(
+            f"임베딩: 요청 {embed_stats['requests']}건 → 배치 {embed_stats['batches']}회"
+            f" (평균 {embed_stats['avg_batch_size']}개, 최대 {embed_stats['max_batch_size']}개)"
+        )
+
+    if metrics_path is not None:
+        metrics = get_stage_metrics()
+        print("\n단계별 지연 (ms):")
+        for name, row in metrics.summary().items():
+            print(f"  {name:<28} n={row['count']:<5} p50={row['p50_ms']:<9} p95={row['p95_ms']:<9} p99={row['p99_ms']}")
+        metrics.write(metrics_path)
+        print(f"지표 저장: {metrics_path}")
+
+    if profile_startup:
+        print("\n시작 프로파일 (ms, 시작 = CLI 모듈 로드 시점):")
+        print(profile.report())
+        if not preloader.done():
+            print("  (preload는 끝나기 전에 더 이상 필요하지 않아 중단됨)")
+        for name, e in preloader.errors.items():
+            print(f"  !! {name} 실패: {e}")
 
-    output_dir = Path("outputs")
-    output_dir.mkdir(exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_path = output_dir / f"result_{timestamp}.json"
-    output_path.write_text(output_json, encoding="utf-8")
-    print(f"\n결과 저장: {output_path}")
+    if output_path is not None:
+        print(f"\n결과 저장: {output_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+import pytest
+
+from analyzer import cache as cache_module
+
+
+class FakeClock:
+    """cache 모듈이 보는 time.time()을 테스트가 직접 움직이는 시계로 바꿉니다."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
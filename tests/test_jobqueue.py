@@ -0,0 +1,170 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+
+from analyzer.jobqueue import JobQueue
+
+# 워커는 별도 프로세스에서 같은 SQLite 파일을 엽니다 (spawn이므로 테스트 프로세스의 연결을 물려받지 않음)
+CONTEXT = multiprocessing.get_context("spawn")
+PROCESS_TIMEOUT = 60
+
+
+def _drain(path, worker_id, lease_seconds, results):
+    """작업이 없을 때까지 하나씩 가져와 완료하고 (작업 id, complete 반환값) 목록을 보냅니다."""
+    queue = JobQueue(path, lease_seconds=lease_seconds)
+    done = []
+    while jobs := queue.claim(worker_id, limit=3):
+        for job in jobs:
+            done.append((job.id, queue.complete(job.id, {"worker": worker_id, "path": job.path})))
+    queue.close()
+    results.put((worker_id, done))
+
+
+def _claim_and_die(path, worker_id, lease_seconds, results):
+    """작업 하나를 가져간 뒤 완료하지 않고 비정상 종료합니다 (lease를 놓지 않음)."""
+    queue = JobQueue(path, lease_seconds=lease_seconds)
+    jobs = queue.claim(worker_id)
+    results.put([(job.id, job.attempts) for job in jobs])
+    # os._exit는 Queue의 전송 스레드를 기다리지 않으므로 먼저 비움
+    results.close()
+    results.join_thread()
+    os._exit(1)
+
+
+def _claim(path, worker_id, lease_seconds, max_attempts, results):
+    queue = JobQueue(path, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    results.put([(job.id, job.path, job.attempts) for job in queue.claim(worker_id)])
+    queue.close()
+
+
+def _complete(path, job_id, result, results):
+    queue = JobQueue(path)
+    results.put(queue.complete(job_id, result))
+    queue.close()
+
+
+def _run(target, *args):
+    """target을 별도 프로세스에서 실행하고 보낸 값을 반환합니다."""
+    results = CONTEXT.Queue()
+    process = CONTEXT.Process(target=target, args=(*args, results))
+    process.start()
+    value = results.get(timeout=PROCESS_TIMEOUT)
+    process.join(PROCESS_TIMEOUT)
+    return value
+
+
+def _row(path, job_id):
+    with sqlite3.connect(str(path)) as conn:
+        status, owner, attempts, result = conn.execute(
+            "SELECT status, owner, attempts, result FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    return status, owner, attempts, json.loads(result) if result else None
+
+
+def test_concurrent_workers_complete_each_job_once(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    queue = JobQueue(path)
+    assert queue.enqueue(f"/images/{i}.jpg" for i in range(200)) == 200
+    assert queue.enqueue(["/images/0.jpg", "/images/200.jpg"]) == 1
+
+    results = CONTEXT.Queue()
+    processes = [
+        CONTEXT.Process(target=_drain, args=(path, f"w{i}", 60.0, results)) for i in range(4)
+    ]
+    for process in processes:
+        process.start()
+    outputs = dict(results.get(timeout=PROCESS_TIMEOUT) for _ in processes)
+    for process in processes:
+        process.join(PROCESS_TIMEOUT)
+        assert process.exitcode == 0
+
+    completed = [job_id for done in outputs.values() for job_id, ok in done if ok]
+    assert all(ok for done in outputs.values() for _, ok in done)
+    assert sorted(completed) == list(range(1, 202))
+    for worker_id, done in outputs.items():
+        for job_id, _ in done[:5]:
+            assert _row(path, job_id)[3]["worker"] == worker_id
+
+    stats = queue.stats()
+    assert (stats["done"], stats["pending"], stats["leased"], stats["workers"]) == (201, 0, 0, 0)
+    queue.close()
+
+
+def test_expired_lease_is_reclaimed_and_late_completion_is_ignored(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    queue = JobQueue(path)
+    queue.enqueue(["/images/a.jpg"])
+
+    assert _run(_claim_and_die, path, "crashed", 1.0) == [(1, 1)]
+    # lease가 남아 있는 동안은 다른 워커가 가져가지 않음
+    assert queue.claim("w1") == []
+    assert queue.stats()["expired"] == 0
+
+    time.sleep(1.1)
+    assert queue.stats()["expired"] == 1
+    assert _run(_claim, path, "w1", 60.0, 3) == [(1, "/images/a.jpg", 2)]
+    assert _row(path, 1)[:3] == ("leased", "w1", 2)
+
+    assert _run(_complete, path, 1, {"worker": "w1"}) is True
+    # lease를 잃은 워커가 늦게 보낸 결과(성공이든 실패든)는 done을 덮어쓰지 않음
+    assert _run(_complete, path, 1, {"worker": "crashed"}) is False
+    assert _run(_complete, path, 1, {"error": "analysis_failed", "message": "late"}) is False
+    assert _row(path, 1) == ("done", None, 2, {"worker": "w1"})
+    assert _run(_claim, path, "w2", 60.0, 3) == []
+    queue.close()
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    queue = JobQueue(path, lease_seconds=0.2, max_attempts=2)
+    queue.enqueue(["/images/poison.jpg", "/images/ok.jpg"])
+
+    assert _run(_claim_and_die, path, "w1", 0.2) == [(1, 1)]
+    time.sleep(0.3)
+    assert _run(_claim_and_die, path, "w2", 0.2) == [(2, 1)]
+    assert _run(_claim_and_die, path, "w3", 0.2) == [(1, 2)]
+    time.sleep(0.3)
+
+    # 두 번 만료된 1번은 실패 처리되고, 한 번 만료된 2번만 다시 나눠줌
+    assert _run(_claim, path, "w4", 60.0, 2) == [(2, "/images/ok.jpg", 2)]
+    status, owner, attempts, result = _row(path, 1)
+    assert (status, owner, attempts, result["error"]) == ("failed", None, 2, "lease_expired")
+    assert _run(_claim, path, "w5", 60.0, 2) == []
+
+    # 실패한 작업은 retry_failed로 시도 횟수를 초기화하여 다시 대기 상태로 돌림
+    assert queue.retry_failed() == 1
+    assert _run(_claim, path, "w5", 60.0, 2) == [(1, "/images/poison.jpg", 1)]
+    queue.close()
+
+
+def test_failed_result_can_be_replaced_but_done_cannot(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    queue = JobQueue(path)
+    queue.enqueue(["/images/a.jpg"])
+
+    assert _run(_claim, path, "w1", 60.0, 3) == [(1, "/images/a.jpg", 1)]
+    assert _run(_complete, path, 1, {"error": "analysis_failed", "message": "timeout"}) is True
+    assert _row(path, 1)[0] == "failed"
+    assert _run(_complete, path, 1, {"product_name": "a"}) is True
+    assert _run(_complete, path, 1, {"product_name": "b"}) is False
+    assert _row(path, 1) == ("done", None, 1, {"product_name": "a"})
+    queue.close()
+
+
+def test_release_returns_unfinished_jobs(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    queue = JobQueue(path)
+    queue.enqueue(["/images/a.jpg", "/images/b.jpg"])
+
+    claimed = queue.claim("w1", limit=2)
+    assert queue.complete(claimed[0].id, {"product_name": "a"})
+    assert queue.release("w1") == 1
+    assert _row(path, claimed[1].id)[:3] == ("pending", None, 0)
+    assert _run(_claim, path, "w2", 60.0, 3) == [(claimed[1].id, "/images/b.jpg", 1)]
+
+    out = tmp_path / "results.jsonl"
+    assert queue.export(out) == 1
+    assert [json.loads(line)["path"] for line in out.read_text(encoding="utf-8").splitlines()] == ["/images/a.jpg"]
+    queue.close()
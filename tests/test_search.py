@@ -0,0 +1,97 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.adk")
+pytest.importorskip("google.genai")
+
+from analyzer import search  # noqa: E402
+from analyzer.cache import SearchCache  # noqa: E402
+from analyzer.search import LocalSearchBackend, configure_search, google_search  # noqa: E402
+
+COLA = {"text": "코카콜라 500ml, 코카콜라컴퍼니", "sources": [{"title": "Coca-Cola", "uri": "https://example.com/coke"}]}
+
+
+@pytest.fixture
+def backend(tmp_path, clock, monkeypatch):
+    # 모듈 전역(백엔드/캐시/TTL)은 테스트마다 원래대로 돌려놓음
+    monkeypatch.setattr(search, "_backend", None)
+    monkeypatch.setattr(search, "_cache", None)
+    monkeypatch.setattr(search, "_cache_ttl", search._cache_ttl)
+    backend = LocalSearchBackend({"Coca-Cola 500ml": COLA})
+    cache = SearchCache(tmp_path / "search.sqlite3", ttl=60)
+    configure_search(backend=backend, ttl=60, cache=cache)
+    yield backend
+    cache.close()
+
+
+def run_search(query: str, country: str = "KR", lang: str = "ko") -> dict:
+    context = SimpleNamespace(state={"country": country, "lang": lang})
+    return json.loads(asyncio.run(google_search(query, context)))
+
+
+def test_hit_is_cached(backend):
+    first = run_search("Coca-Cola 500ml")
+    assert first == {"query": "Coca-Cola 500ml", **COLA, "cached": False}
+
+    second = run_search("Coca-Cola 500ml")
+    assert second == {"query": "Coca-Cola 500ml", **COLA, "cached": True}
+    assert backend.calls == 1
+
+
+def test_miss_is_not_cached(backend):
+    for _ in range(2):
+        result = run_search("unknown product")
+        assert result == {"query": "unknown product", "text": "", "sources": [], "cached": False}
+    assert backend.calls == 2
+
+
+def test_expired_entry_searches_again(backend, clock):
+    run_search("Coca-Cola 500ml")
+    clock.now += 59
+    assert run_search("Coca-Cola 500ml")["cached"] is True
+
+    clock.now += 1
+    result = run_search("Coca-Cola 500ml")
+    assert result["cached"] is False
+    assert result["text"] == COLA["text"]
+    assert backend.calls == 2
+
+
+def test_normalized_queries_share_entry(backend):
+    run_search("Coca-Cola 500ml")
+    for variant in ("500ML coca cola", "  coca, COLA 500ml!", "cola coca 500ml coca"):
+        result = run_search(variant)
+        # 캐시 적중이어도 응답에는 호출한 검색어가 그대로 들어감
+        assert result == {"query": variant, **COLA, "cached": True}
+    assert backend.calls == 1
+
+
+def test_market_is_part_of_key(backend):
+    run_search("Coca-Cola 500ml", "KR", "ko")
+    assert run_search("Coca-Cola 500ml", "JP", "ja")["cached"] is False
+    assert run_search("Coca-Cola 500ml", "KR", "en")["cached"] is False
+    assert backend.calls == 3
+
+
+def test_disabled_cache_always_searches(backend):
+    configure_search(ttl=0)
+    assert search.get_search_cache() is None
+    for _ in range(2):
+        assert run_search("Coca-Cola 500ml")["cached"] is False
+    assert backend.calls == 2
+
+
+def test_local_backend_from_jsonl(tmp_path):
+    path = tmp_path / "search.jsonl"
+    path.write_text(
+        json.dumps({"query": "Coca-Cola 500ml", **COLA}, ensure_ascii=False) + "\n\n"
+        + json.dumps({"query": "신라면"}, ensure_ascii=False) + "\n",
+        encoding="utf-8",
+    )
+    backend = LocalSearchBackend.from_jsonl(path)
+    assert asyncio.run(backend.search("500ml COCA-COLA", "KR", "ko")) == COLA
+    assert asyncio.run(backend.search("신라면", "KR", "ko")) == {"text": "", "sources": []}
+    assert backend.calls == 2
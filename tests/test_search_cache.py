@@ -0,0 +1,106 @@
+import pytest
+
+from analyzer.cache import SearchCache, make_search_key, normalize_search_query
+
+
+@pytest.fixture
+def search_cache(tmp_path, clock):
+    cache = SearchCache(tmp_path / "search.sqlite3", ttl=60, max_entries=3)
+    yield cache
+    cache.close()
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("Coca-Cola 500ml", "500ml coca cola"),
+        ("  COCA cola,  500ML!! ", "500ml coca cola"),
+        ("cola coca cola 500ml", "500ml coca cola"),
+        ("ＣＯＣＡ　ＣＯＬＡ", "coca cola"),  # 전각 문자는 NFKC로 정규화
+        ("신라면 (120g)", "120g 신라면"),
+        ("", ""),
+        ("!!!", ""),
+    ],
+)
+def test_normalize_search_query(query, expected):
+    assert normalize_search_query(query) == expected
+
+
+def test_search_key_ignores_word_order_and_case_but_not_market():
+    key = make_search_key("Coca-Cola 500ml", "KR", "ko")
+    assert make_search_key("500ML coca cola", " kr ", "KO") == key
+    assert make_search_key("Coca-Cola 500ml", "JP", "ko") != key
+    assert make_search_key("Coca-Cola 500ml", "KR", "en") != key
+    assert make_search_key("Coca-Cola 1.5l", "KR", "ko") != key
+
+
+def test_get_returns_stored_payload_until_ttl(search_cache, clock):
+    key = make_search_key("coca cola", "KR", "ko")
+    payload = {"text": "코카콜라", "sources": [{"title": "t", "uri": "https://example.com"}]}
+    search_cache.put(key, "coca cola", payload)
+
+    clock.now += 59
+    assert search_cache.get(key) == payload
+    clock.now += 1
+    assert search_cache.get(key) is None
+    assert search_cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_access_does_not_extend_ttl(search_cache, clock):
+    key = make_search_key("coca cola", "KR", "ko")
+    search_cache.put(key, "coca cola", {"text": "a", "sources": []})
+    for _ in range(3):
+        clock.now += 20
+        search_cache.get(key)
+    assert search_cache.get(key) is None
+
+
+def test_put_refreshes_expiry(search_cache, clock):
+    key = make_search_key("coca cola", "KR", "ko")
+    search_cache.put(key, "coca cola", {"text": "old", "sources": []})
+    clock.now += 50
+    search_cache.put(key, "Coca Cola", {"text": "new", "sources": []})
+    clock.now += 50
+    assert search_cache.get(key) == {"text": "new", "sources": []}
+    assert search_cache.stats()["entries"] == 1
+
+
+def test_expired_entries_are_dropped_before_lru(search_cache, clock):
+    keys = [make_search_key(f"query {i}", "KR", "ko") for i in range(4)]
+    search_cache.put(keys[0], "query 0", {"text": "0", "sources": []})
+    clock.now += 61
+    for i in (1, 2, 3):
+        search_cache.put(keys[i], f"query {i}", {"text": str(i), "sources": []})
+        clock.now += 1
+
+    assert search_cache.stats()["entries"] == 3
+    assert [search_cache.get(key) is not None for key in keys] == [False, True, True, True]
+
+
+def test_least_recently_used_entry_is_evicted(search_cache, clock):
+    keys = [make_search_key(f"query {i}", "KR", "ko") for i in range(4)]
+    for i in range(3):
+        search_cache.put(keys[i], f"query {i}", {"text": str(i), "sources": []})
+        clock.now += 1
+    search_cache.get(keys[0])
+    clock.now += 1
+    search_cache.put(keys[3], "query 3", {"text": "3", "sources": []})
+
+    assert search_cache.stats()["entries"] == 3
+    assert search_cache.get(keys[1]) is None
+    assert all(search_cache.get(key) is not None for key in (keys[0], keys[2], keys[3]))
+
+
+def test_entries_survive_reopen(tmp_path, clock):
+    path = tmp_path / "search.sqlite3"
+    key = make_search_key("coca cola", "KR", "ko")
+    cache = SearchCache(path, ttl=60)
+    cache.put(key, "coca cola", {"text": "a", "sources": []})
+    cache.close()
+
+    reopened = SearchCache(path, ttl=60)
+    try:
+        assert reopened.stats()["entries"] == 1
+        assert reopened.get(key) == {"text": "a", "sources": []}
+    finally:
+        reopened.close()